@@ -1,34 +1,112 @@
 # admin_app/admin_app.py
 
+import io
 import os
 import sys
 from datetime import datetime
-from flask import Flask, redirect, url_for, request, flash, render_template, jsonify
+
+import click
+from flask import Flask, Response, redirect, url_for, request, flash, render_template, jsonify, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from flask_admin import Admin, AdminIndexView
+from flask_admin import Admin, AdminIndexView, expose
+from flask_admin.actions import action
 from flask_admin.contrib.sqla import ModelView
+from flask_admin.menu import MenuLink
 from flask_socketio import SocketIO, emit, join_room
+from wtforms import HiddenField
+from wtforms.validators import ValidationError
 
 # Añadir ruta a módulos compartidos
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from shared.config import Config
-from shared.models import db, Product, Order, OrderItem, AdminUser
+from shared.models import db, Product, Order, OrderItem, AdminUser, ArchivedOrder
+from shared.orders import bulk_update_status, order_feed, order_changes, current_sync_cursor
+from shared.schema import upgrade_schema
+from shared.search import apply_order_search
+from shared.rollups import forget_orders, record_order_changes, rebuild_rollups, sales_summary
+from shared.export import generate_export, parse_export_filters
+from shared.archive import archive_closed_orders
+from shared.product_import import format_from_filename, import_products
+from shared.broadcast import make_client_manager, on_server_signal, send_server_signal, on_remote_emit, event_sequence
+from shared.auth_cache import AdminIdentity, TTLCache
+from shared.catalog import CatalogCache
+from shared.database import InstrumentedQueuePool, make_psycopg2_cooperative, pool_status
+from shared.notifications import AlertCoalescer
+from shared.metrics import Metrics
+from shared.replay import EventLog
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 app.config.from_object(Config)
 
+# async_mode='gevent': las consultas no deben bloquear el hub mientras esperan a PostgreSQL
+if app.config['DB_COOPERATIVE']:
+    make_psycopg2_cooperative()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(app.config['SQLALCHEMY_ENGINE_OPTIONS'],
+                                               poolclass=InstrumentedQueuePool)
 db.init_app(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent')
+# Con SOCKETIO_MESSAGE_QUEUE configurado, los emits a 'admin_dashboard' llegan a todos los workers
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent',
+                    client_manager=make_client_manager(app.config))
+
+# --- Métricas ---
+metrics = Metrics()
+metrics.init_app(app)
+with app.app_context():
+    metrics.instrument_engine(db.engine)
+
+def dashboard_client_count():
+    # Clientes conectados a este worker en la sala del dashboard
+    return sum(1 for _ in socketio.server.manager.get_participants('/', 'admin_dashboard'))
+
+# Últimos eventos del dashboard, numerados, para reenviarlos a los clientes que se reconectan
+dashboard_events = EventLog(app.config['DASHBOARD_EVENT_BUFFER'], sequence=event_sequence(socketio))
+on_remote_emit(socketio, 'admin_dashboard', dashboard_events.record)
+
+def emit_to_dashboard(event, data):
+    data = dashboard_events.stamp(data)
+    dashboard_events.record(event, data)
+    metrics.observe_emit(event, dashboard_client_count())
+    socketio.emit(event, data, room='admin_dashboard')
+
+metrics.gauge('admin_dashboard_clients', 'Clientes en la sala admin_dashboard de este worker.',
+              dashboard_client_count)
+metrics.gauge('admin_db_pool_checked_out', 'Conexiones del pool en uso.',
+              lambda: pool_status(db.engine).get('checked_out', 0))
+metrics.gauge('admin_db_pool_waiting', 'Peticiones esperando una conexión del pool.',
+              lambda: pool_status(db.engine).get('waiting', 0))
+metrics.gauge('admin_db_pool_max_wait_seconds', 'Mayor espera observada por una conexión del pool.',
+              lambda: pool_status(db.engine).get('max_wait_ms', 0.0) / 1000)
+
+alert_coalescer = AlertCoalescer(socketio, app.config['ORDER_ALERT_COALESCE_SECONDS'], emit=emit_to_dashboard)
 
 # --- Login ---
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'admin_login'
 
+# Identidades de administrador cacheadas: evita una consulta en cada petición y evento Socket.IO
+admin_user_cache = TTLCache(ttl=app.config['ADMIN_USER_CACHE_TTL'], maxsize=app.config['ADMIN_USER_CACHE_SIZE'])
+
+def load_admin_identity(user_id):
+    row = db.session.execute(
+        db.select(AdminUser.id, AdminUser.username).where(AdminUser.id == user_id)
+    ).first()
+    return AdminIdentity(row.id, row.username) if row else None
+
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(AdminUser, int(user_id))
+    return admin_user_cache.get_or_load(int(user_id), load_admin_identity)
+
+# Cuando un worker edita o borra un administrador, todos descartan su copia cacheada
+on_server_signal(socketio, 'admin_user_invalidated',
+                 lambda data: admin_user_cache.invalidate(data['user_id']))
+
+def invalidate_admin_user(user_id, revoked=False):
+    send_server_signal(socketio, 'admin_user_invalidated', {'user_id': user_id})
+    if revoked:
+        # Los dashboards abiertos de ese usuario vuelven a la pantalla de login
+        socketio.emit('session_revoked', {}, room=f'admin_user_{user_id}')
 
 # --- Flask-Admin ---
 class MyAdminIndexView(AdminIndexView):
@@ -47,18 +125,142 @@ class AuthenticatedModelView(ModelView):
     def inaccessible_callback(self, name, **kwargs):
         return redirect(url_for('admin_login', next=request.url))
 
-admin.add_view(AuthenticatedModelView(Product, db.session, name='Productos'))
+# Catálogo serializado en memoria; cualquier cambio en Productos sube su versión en todos los workers
+catalog_cache = CatalogCache(ttl=app.config['CATALOG_CACHE_TTL'])
+on_server_signal(socketio, 'catalog_changed', lambda data: catalog_cache.bump())
+
+class ProductAdminView(AuthenticatedModelView):
+    def after_model_change(self, form, model, is_created):
+        send_server_signal(socketio, 'catalog_changed', {})
+
+    def after_model_delete(self, model):
+        send_server_signal(socketio, 'catalog_changed', {})
+
+    @expose('/import/', methods=('GET', 'POST'))
+    def import_view(self):
+        # Alta y actualización masiva desde CSV/JSON, en lotes; las filas con errores se listan al final
+        report = None
+        upload = request.files.get('file')
+        if request.method == 'POST':
+            if not upload or not upload.filename:
+                flash('Selecciona un archivo CSV o JSON.', 'error')
+            else:
+                stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+                report = import_products(stream, format_from_filename(upload.filename),
+                                         batch_size=app.config['PRODUCT_IMPORT_BATCH_SIZE'])
+                if report.created or report.updated:
+                    send_server_signal(socketio, 'catalog_changed', {})
+        return self.render('admin/product_import.html', report=report)
+
+admin.add_view(ProductAdminView(Product, db.session, name='Productos'))
+admin.add_link(MenuLink(name='Importar productos', endpoint='product.import_view'))
+
+class VersionField(HiddenField):
+    # Lleva en el formulario la versión que vio el administrador; nunca se copia al modelo
+    def populate_obj(self, obj, name):
+        pass
 
 class OrderAdminView(AuthenticatedModelView):
     column_list = ('id', 'customer_name', 'customer_address', 'customer_phone', 'total_amount', 'status', 'order_date')
     column_sortable_list = ('id', 'order_date', 'total_amount', 'status')
     column_filters = ('status', 'order_date')
     column_searchable_list = ('customer_name', 'customer_address', 'customer_phone')
-    form_columns = ('customer_name', 'customer_address', 'customer_phone', 'total_amount', 'status', 'order_date', 'items')
-    inline_models = [OrderItem]
+    form_columns = ('customer_name', 'customer_address', 'customer_phone', 'total_amount', 'status', 'order_date', 'items',
+                    'version')
+    form_extra_fields = {'version': VersionField()}
+    # El producto de cada item se elige por AJAX: sin esto cada fila inline consulta el catálogo completo
+    inline_models = [(OrderItem, {
+        'form_ajax_refs': {'product': {'fields': ('name',), 'page_size': 20}}
+    })]
+
+    def _apply_search(self, query, count_query, joins, count_joins, search):
+        # Sin CAST ni ILIKE sobre el teléfono crudo: usa los índices trigram y customer_phone_digits
+        query = apply_order_search(query, search)
+        if count_query is not None:
+            count_query = apply_order_search(count_query, search)
+        return query, count_query, joins, count_joins
+
+    def on_model_change(self, form, model, is_created):
+        # Concurrencia optimista en el formulario: si otro administrador guardó el pedido desde que
+        # se abrió, se rechaza en lugar de sobrescribir sus cambios. Si el cambio ajeno llega entre
+        # esta comprobación y el commit, version_id_col lo detecta (StaleDataError).
+        if not is_created and form.version.data and form.version.data != str(model.version):
+            raise ValidationError('Otro administrador modificó este pedido mientras lo editabas. '
+                                  'Vuelve a abrirlo para ver sus cambios.')
+        # Fecha, importe o items pueden haber cambiado: se resta lo contabilizado con los valores
+        # anteriores y se vuelve a sumar con los nuevos, en la misma transacción que el formulario
+        if not is_created:
+            forget_orders([model.id])
+            self.session.flush()
+            # Se relee como quedó guardado (rollup_status NULL; importes como float, no el Decimal del formulario)
+            self.session.expire(model)
+            record_order_changes([model.id])
+
+    def after_model_change(self, form, model, is_created):
+        # Un pedido creado desde el formulario solo tiene id después del commit
+        if is_created:
+            record_order_changes([model.id])
+            self.session.commit()
+
+    def on_model_delete(self, model):
+        # En la misma transacción que el borrado, para que los rollups no sigan contándolo
+        forget_orders([model.id])
+
+    def get_one(self, id):
+        # Items y productos del pedido cargados de una vez para el formulario de edición
+        return (self.session.query(Order)
+                .options(Order.items_loader())
+                .filter(Order.id == int(id))
+                .one_or_none())
+
+    def _bulk_status_action(self, ids, new_status, label):
+        updated, conflicts = bulk_update_status([{'order_id': order_id} for order_id in ids], new_status)
+        emit_status_updates(updated, current_user.username)
+        flash(f'{len(updated)} pedido(s) marcados como {label}.', 'success')
+        if conflicts:
+            flash(f'{len(conflicts)} pedido(s) no se pudieron actualizar.', 'warning')
+
+    @action('mark_confirmed', 'Marcar como confirmado', '¿Marcar los pedidos seleccionados como confirmados?')
+    def action_mark_confirmed(self, ids):
+        self._bulk_status_action(ids, 'confirmed', 'confirmados')
+
+    @action('mark_delivered', 'Marcar como entregado', '¿Marcar los pedidos seleccionados como entregados?')
+    def action_mark_delivered(self, ids):
+        self._bulk_status_action(ids, 'delivered', 'entregados')
+
+    @action('mark_cancelled', 'Marcar como cancelado', '¿Marcar los pedidos seleccionados como cancelados?')
+    def action_mark_cancelled(self, ids):
+        self._bulk_status_action(ids, 'cancelled', 'cancelados')
 
 admin.add_view(OrderAdminView(Order, db.session, name='Pedidos'))
 
+class ArchivedOrderAdminView(AuthenticatedModelView):
+    # Solo lectura: los pedidos archivados ya están cerrados
+    can_create = False
+    can_edit = False
+    can_delete = False
+    can_view_details = True
+    column_list = ('id', 'customer_name', 'customer_address', 'customer_phone', 'total_amount', 'status',
+                   'order_date', 'archived_at')
+    column_details_list = column_list + ('items',)
+    column_sortable_list = ('id', 'order_date', 'total_amount', 'status', 'archived_at')
+    column_filters = ('status', 'order_date')
+    column_searchable_list = ('customer_name', 'customer_address', 'customer_phone')
+    column_default_sort = ('order_date', True)
+    column_formatters = {
+        'items': lambda view, context, model, name: ', '.join(
+            f"{item.quantity} x {item.product.name if item.product else item.product_id}" for item in model.items)
+    }
+
+    def _apply_search(self, query, count_query, joins, count_joins, search):
+        query = apply_order_search(query, search, ArchivedOrder)
+        if count_query is not None:
+            count_query = apply_order_search(count_query, search, ArchivedOrder)
+        return query, count_query, joins, count_joins
+
+admin.add_view(ArchivedOrderAdminView(ArchivedOrder, db.session, name='Pedidos archivados',
+                                      endpoint='archived_order'))
+
 class AdminUserView(AuthenticatedModelView):
     column_list = ('id', 'username')
     form_columns = ('username', 'password_hash')
@@ -71,6 +273,14 @@ class AdminUserView(AuthenticatedModelView):
             raise ValueError('La contraseña es requerida para nuevos usuarios.')
         return super().on_model_change(form, model, is_created)
 
+    def after_model_change(self, form, model, is_created):
+        # Después del commit, para que ningún worker vuelva a cachear los datos anteriores
+        if not is_created:
+            invalidate_admin_user(model.id)
+
+    def after_model_delete(self, model):
+        invalidate_admin_user(model.id, revoked=True)
+
 admin.add_view(AdminUserView(AdminUser, db.session, name='Usuarios Admin'))
 
 # --- Rutas ---
@@ -110,57 +320,214 @@ def admin_logout():
 @app.route('/admin/dashboard')
 @login_required
 def admin_dashboard():
-    recent_orders = Order.query.order_by(Order.order_date.desc()).limit(10).all()
-    return render_template('admin_dashboard.html', orders=recent_orders)
+    # La secuencia se lee antes de la consulta: lo que llegue después se reenvía al conectar
+    event_seq = dashboard_events.latest
+    recent_orders, next_cursor = order_feed(limit=10)
+    return render_template('admin_dashboard.html', orders=recent_orders,
+                           next_cursor=next_cursor, sync_cursor=current_sync_cursor(),
+                           sales=sales_summary(), event_epoch=dashboard_events.epoch, event_seq=event_seq)
+
+@app.route('/admin-api/orders/feed')
+@login_required
+def orders_feed():
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    since = request.args.get('since')
+    try:
+        if since is not None:
+            # Sincronización incremental: solo lo creado o modificado desde el último cursor
+            orders, sync_cursor, has_more = order_changes(since or None, limit=limit)
+            return jsonify({
+                'orders': [order.to_alert_dict() for order in orders],
+                'sync_cursor': sync_cursor,
+                'has_more': has_more
+            })
+        orders, next_cursor = order_feed(request.args.get('cursor'), limit=limit)
+    except ValueError:
+        return jsonify({'message': 'Cursor inválido'}), 400
+    return jsonify({
+        'orders': [order.to_alert_dict() for order in orders],
+        'next_cursor': next_cursor
+    })
+
+@app.route('/admin-api/orders/<int:order_id>')
+@login_required
+def order_detail(order_id):
+    # ?include_archived=1 busca también en el archivo de pedidos cerrados
+    include_archived = request.args.get('include_archived', '').lower() in ('1', 'true')
+    order = Order.find(order_id, include_archived=include_archived)
+    if order is None:
+        return jsonify({'message': 'Pedido no encontrado'}), 404
+    return jsonify(order.to_dict())
+
+@app.route('/admin/orders/export')
+@login_required
+def export_orders():
+    export_format = request.args.get('format', 'csv')
+    try:
+        # Los pedidos archivados se incluyen salvo include_archived=0
+        filters = parse_export_filters(request.args.get('status'), request.args.get('date_from'),
+                                       request.args.get('date_to'),
+                                       request.args.get('include_archived', '1') not in ('0', 'false'))
+        chunks = generate_export(export_format, **filters)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    filename = f"pedidos_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    # La respuesta se genera mientras se lee el cursor, sin cargar la exportación en memoria
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/admin/metrics')
+@login_required
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin-api/pool-stats')
+@login_required
+def database_pool_stats():
+    return jsonify(pool_status(db.engine))
+
+@app.route('/admin-api/catalog')
+def product_catalog():
+    entry = catalog_cache.get()
+    response = Response(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    # Los clientes siempre revalidan; si no cambió, reciben 304 sin cuerpo
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 @app.route('/admin-api/new-order-notification', methods=['POST'])
 def new_order_notification():
     data = request.get_json()
     order_id = data.get('order_id')
     if order_id:
-        order = Order.query.get(order_id)
+        order = db.session.get(Order, order_id)
         if order:
-            socketio.emit('new_order_alert', {
-                'order_id': order.id,
-                'customer_name': order.customer_name,
-                'customer_phone': order.customer_phone,
-                'total_amount': order.total_amount,
-                'status': order.status,
-                'order_date': order.order_date.isoformat()
-            }, room='admin_dashboard')
+            alert = order.to_alert_dict()
+            record_order_changes([order.id])
+            db.session.commit()
+            if app.config['ORDER_ALERT_COALESCE_SECONDS'] > 0:
+                alert_coalescer.add([alert])
+            else:
+                emit_to_dashboard('new_order_alert', alert)
             return jsonify({'message': 'Notificación procesada'}), 200
     return jsonify({'message': 'ID de pedido no proporcionado'}), 400
 
+@app.route('/admin-api/new-order-notifications', methods=['POST'])
+def new_order_notifications():
+    data = request.get_json(silent=True) or {}
+    order_ids = data.get('order_ids')
+    if not isinstance(order_ids, list) or not order_ids:
+        return jsonify({'message': 'Lista de IDs de pedido no proporcionada'}), 400
+    try:
+        order_ids = {int(order_id) for order_id in order_ids}
+    except (TypeError, ValueError):
+        return jsonify({'message': 'IDs de pedido inválidos'}), 400
+    if len(order_ids) > app.config['ORDER_NOTIFICATION_BATCH_MAX']:
+        return jsonify({'message': 'Demasiados pedidos en una sola notificación'}), 413
+
+    # Una sola consulta IN (...) para todo el lote
+    orders = Order.query.filter(Order.id.in_(order_ids)).order_by(Order.order_date, Order.id).all()
+    alerts = [order.to_alert_dict() for order in orders]
+    record_order_changes([alert['order_id'] for alert in alerts])
+    db.session.commit()
+    alert_coalescer.add(alerts)
+    missing = sorted(order_ids - {alert['order_id'] for alert in alerts})
+    return jsonify({'message': 'Notificaciones procesadas', 'notified': len(orders), 'missing': missing}), 200
+
 # --- Socket.IO ---
 @socketio.on('connect')
-def handle_connect():
+@metrics.timed_event('connect')
+def handle_connect(auth=None):
     if current_user.is_authenticated:
         join_room('admin_dashboard')
+        join_room(f'admin_user_{current_user.id}')
         emit('my_response', {'data': f'Conectado al dashboard admin. Sesión: {request.sid}'}, room=request.sid)
+        replay_missed_events(auth or {})
+
+def replay_missed_events(auth):
+    # El cliente indica el último evento que vio; se calcula ya dentro de la sala para no perder
+    # los que se emitan mientras tanto (el cliente descarta los repetidos por su número)
+    try:
+        last_seq = int(auth.get('last_seq'))
+    except (TypeError, ValueError):
+        return
+    missed = dashboard_events.since(auth.get('epoch'), last_seq)
+    if missed is None:
+        emit('dashboard_resync', {'epoch': dashboard_events.epoch, 'seq': dashboard_events.latest},
+             room=request.sid)
+    elif missed:
+        emit('dashboard_replay', {'events': [{'event': event, 'data': data} for event, data in missed]},
+             room=request.sid)
 
 @socketio.on('disconnect')
+@metrics.timed_event('disconnect')
 def handle_disconnect():
     app.logger.info(f"Cliente SocketIO desconectado: {request.sid}")
 
+def emit_status_updates(updated, username):
+    # Un único evento con todas las filas cambiadas, en lugar de uno por pedido
+    if updated:
+        emit_to_dashboard('order_status_updated', {
+            'orders': updated,
+            'updated_by': username
+        })
+
+def apply_status_change(changes, new_status):
+    try:
+        updated, conflicts = bulk_update_status(changes, new_status)
+    except (KeyError, TypeError, ValueError):
+        emit('status_update_error', {'message': 'Solicitud de cambio de estado inválida'}, room=request.sid)
+        return
+    emit_status_updates(updated, current_user.username)
+    if conflicts:
+        # Solo al cliente que pidió el cambio: otro admin modificó esos pedidos antes
+        emit('status_update_conflict', {'orders': conflicts}, room=request.sid)
+
 @socketio.on('status_update_request')
+@metrics.timed_event('status_update_request')
 @login_required
 def handle_status_update(data):
     order_id = data.get('order_id')
     new_status = data.get('new_status')
 
     if order_id and new_status:
-        order = db.session.get(Order, order_id)
-        if order:
-            order.status = new_status
-            db.session.commit()
-            socketio.emit('order_status_updated', {
-                'order_id': order.id,
-                'new_status': order.status,
-                'updated_by': current_user.username
-            }, room='admin_dashboard')
+        apply_status_change([{'order_id': order_id, 'version': data.get('version')}], new_status)
+
+@socketio.on('bulk_status_update_request')
+@metrics.timed_event('bulk_status_update_request')
+@login_required
+def handle_bulk_status_update(data):
+    orders = data.get('orders')
+    new_status = data.get('new_status')
+
+    if orders and new_status:
+        apply_status_change(orders, new_status)
+
+# --- Comandos CLI ---
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Crea las tablas que falten y aplica los cambios de columnas pendientes."""
+    upgrade_schema()
+    print('Esquema de base de datos actualizado.')
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recalcula los rollups de ventas a partir de todo el historial de pedidos."""
+    rebuild_rollups()
+    print('Rollups de ventas reconstruidos.')
+
+@app.cli.command('archive-orders')
+@click.option('--days', type=int, default=None, help='Antigüedad mínima (días sin cambios) de los pedidos a archivar.')
+def archive_orders_command(days):
+    """Mueve al archivo los pedidos entregados o cancelados sin cambios recientes."""
+    days = app.config['ORDER_ARCHIVE_AFTER_DAYS'] if days is None else days
+    archived = archive_closed_orders(days, batch_size=app.config['ORDER_ARCHIVE_BATCH_SIZE'])
+    print(f'{archived} pedido(s) archivados.')
 
 # --- Inicio del servidor ---
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        upgrade_schema()
     socketio.run(app, host='0.0.0.0', port=5001, debug=True, allow_unsafe_werkzeug=True)
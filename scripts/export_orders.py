@@ -0,0 +1,56 @@
+# admin_app/scripts/export_orders.py
+# Exporta pedidos + items a CSV o NDJSON con un cursor del lado del servidor.
+#
+#   python scripts/export_orders.py --status delivered --date-from 2024-05-01 --date-to 2024-05-31 -o mayo.csv
+#   python scripts/export_orders.py --format ndjson > pedidos.ndjson
+#   python scripts/export_orders.py --active-only -o activos.csv   (sin los pedidos archivados)
+import argparse
+import os
+import sys
+
+# La raíz del proyecto va primero para usar shared/ (y no la copia de scripts/shared)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+from shared.config import Config
+from shared.export import EXPORT_FORMATS, generate_export, parse_export_filters
+from shared.models import db, ORDER_STATUSES
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exportación de pedidos')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    parser.add_argument('--status', choices=ORDER_STATUSES)
+    parser.add_argument('--date-from', help='Fecha inicial (YYYY-MM-DD), inclusive')
+    parser.add_argument('--date-to', help='Fecha final (YYYY-MM-DD), inclusive')
+    parser.add_argument('--active-only', action='store_true',
+                        help='Solo pedidos activos (por defecto también se exportan los archivados)')
+    parser.add_argument('-o', '--output', help='Archivo de salida (por defecto, la salida estándar)')
+    parser.add_argument('--database-url', help='Sobrescribe SQLALCHEMY_DATABASE_URI de Config')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if args.database_url:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    db.init_app(app)
+
+    try:
+        filters = parse_export_filters(args.status, args.date_from, args.date_to,
+                                       include_archived=not args.active_only)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        with app.app_context():
+            for chunk in generate_export(args.format, **filters):
+                output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# admin_app/scripts/import_products.py
+# Importa o actualiza productos en lote desde un CSV o JSON.
+#
+#   python scripts/import_products.py menu_verano.csv
+#   python scripts/import_products.py precios.json --batch-size 1000
+import argparse
+import os
+import sys
+
+# La raíz del proyecto va primero para usar shared/ (y no la copia de scripts/shared)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+from shared.broadcast import publish_server_signal
+from shared.config import Config
+from shared.models import db
+from shared.product_import import IMPORT_FORMATS, format_from_filename, import_products
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importación masiva de productos')
+    parser.add_argument('file', help='Archivo CSV o JSON (lista de objetos o uno por línea)')
+    parser.add_argument('--format', choices=IMPORT_FORMATS, help='Por defecto, según la extensión del archivo')
+    parser.add_argument('--batch-size', type=int, default=Config.PRODUCT_IMPORT_BATCH_SIZE)
+    parser.add_argument('--database-url', help='Sobrescribe SQLALCHEMY_DATABASE_URI de Config')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if args.database_url:
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+    db.init_app(app)
+
+    with app.app_context(), open(args.file, encoding='utf-8-sig', newline='') as stream:
+        report = import_products(stream, args.format or format_from_filename(args.file),
+                                 batch_size=args.batch_size)
+
+    for line, message in report.errors:
+        print(f'Línea {line}: {message}', file=sys.stderr)
+    if report.failed > len(report.errors):
+        print(f'... y {report.failed - len(report.errors)} error(es) más.', file=sys.stderr)
+    print(f'{report.created} producto(s) creados, {report.updated} actualizados, {report.failed} fila(s) con errores.')
+
+    if report.created or report.updated:
+        # Los workers del panel vacían su caché del catálogo; sin backend de PostgreSQL expira por TTL
+        if not publish_server_signal(app.config, 'catalog_changed', {}):
+            print(f'El catálogo cacheado se actualizará en {app.config["CATALOG_CACHE_TTL"]} s como máximo.')
+    sys.exit(1 if report.failed else 0)
+
+
+if __name__ == '__main__':
+    main()
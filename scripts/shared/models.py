@@ -1,10 +1,19 @@
 # shared/models.py
+import re
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import selectinload, validates
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash # Para usuarios admin
 
 db = SQLAlchemy()
 
+# Estados válidos de un pedido, en el orden en que se muestran en el dashboard
+ORDER_STATUSES = ('pending', 'confirmed', 'delivered', 'cancelled')
+
+def normalize_phone(phone):
+    # Solo los dígitos: '+58 (412) 555-1234' -> '584125551234'
+    return re.sub(r'\D', '', phone or '')
+
 class Product(db.Model):
     __tablename__ = 'products'
     id = db.Column(db.Integer, primary_key=True)
@@ -24,17 +33,9 @@ class Product(db.Model):
             'is_available': self.is_available
         }
 
-class Order(db.Model):
-    __tablename__ = 'orders'
-    id = db.Column(db.Integer, primary_key=True)
-    customer_name = db.Column(db.String(100), nullable=False)
-    customer_address = db.Column(db.String(255), nullable=False)
-    customer_phone = db.Column(db.String(20), nullable=False)
-    total_amount = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(50), default='pending')
-    order_date = db.Column(db.DateTime, default=datetime.utcnow)
-
-    items = db.relationship('OrderItem', backref='order', lazy=True)
+class OrderSerializationMixin:
+    # Serialización común a pedidos activos y archivados
+    archived = False
 
     def to_dict(self):
         return {
@@ -44,20 +45,25 @@ class Order(db.Model):
             'customer_phone': self.customer_phone,
             'total_amount': self.total_amount,
             'status': self.status,
+            'version': self.version,
             'order_date': self.order_date.isoformat(),
+            'archived': self.archived,
             'items': [item.to_dict() for item in self.items]
         }
 
-class OrderItem(db.Model):
-    __tablename__ = 'order_items'
-    id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
-    unit_price = db.Column(db.Float, nullable=False)
-
-    product = db.relationship('Product', backref='order_items', lazy=True)
+    def to_alert_dict(self):
+        # Payload de las alertas de nuevo pedido del dashboard (sin items)
+        return {
+            'order_id': self.id,
+            'customer_name': self.customer_name,
+            'customer_phone': self.customer_phone,
+            'total_amount': self.total_amount,
+            'status': self.status,
+            'version': self.version,
+            'order_date': self.order_date.isoformat()
+        }
 
+class OrderItemSerializationMixin:
     def to_dict(self):
         return {
             'id': self.id,
@@ -67,6 +73,134 @@ class OrderItem(db.Model):
             'unit_price': self.unit_price
         }
 
+class Order(OrderSerializationMixin, db.Model):
+    __tablename__ = 'orders'
+    id = db.Column(db.Integer, primary_key=True)
+    customer_name = db.Column(db.String(100), nullable=False)
+    customer_address = db.Column(db.String(255), nullable=False)
+    customer_phone = db.Column(db.String(20), nullable=False)
+    # Teléfono normalizado para la búsqueda. En PostgreSQL lo calcula un trigger (shared/schema.py);
+    # en SQLite se mantiene al asignar customer_phone desde el ORM
+    customer_phone_digits = db.Column(db.String(20), nullable=True)
+    total_amount = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(50), default='pending')
+    order_date = db.Column(db.DateTime, default=datetime.utcnow)
+    # Última modificación: base de la sincronización incremental del dashboard
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Concurrencia optimista: cada escritura incrementa la versión
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Estado con el que el pedido está contabilizado en los rollups (None = aún no contabilizado)
+    rollup_status = db.Column(db.String(50), nullable=True)
+
+    # Al borrar un pedido se borran sus items
+    items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
+
+    __mapper_args__ = {'version_id_col': version}
+    # Índices compuestos para la paginación por cursor (keyset) del feed de pedidos
+    __table_args__ = (
+        db.Index('ix_orders_order_date_id', 'order_date', 'id'),
+        db.Index('ix_orders_updated_at_id', 'updated_at', 'id'),
+        # Índices trigram (pg_trgm) para las búsquedas '%término%' del panel; en otros motores son índices normales
+        db.Index('ix_orders_customer_name_trgm', 'customer_name',
+                 postgresql_using='gin', postgresql_ops={'customer_name': 'gin_trgm_ops'}),
+        db.Index('ix_orders_customer_address_trgm', 'customer_address',
+                 postgresql_using='gin', postgresql_ops={'customer_address': 'gin_trgm_ops'}),
+        db.Index('ix_orders_customer_phone_digits_trgm', 'customer_phone_digits',
+                 postgresql_using='gin', postgresql_ops={'customer_phone_digits': 'gin_trgm_ops'}),
+        # Sin AUTOINCREMENT, SQLite vuelve a dar los ids más altos cuando esos pedidos pasan al archivo
+        {'sqlite_autoincrement': True},
+    )
+
+    @validates('customer_phone')
+    def _sync_phone_digits(self, key, phone):
+        self.customer_phone_digits = normalize_phone(phone)
+        return phone
+
+    @staticmethod
+    def items_loader():
+        # Opción de carga para serializar con to_dict() sin N+1: los items de todos los
+        # pedidos en una sola consulta IN (...) y el nombre del producto con un JOIN
+        return selectinload(Order.items).joinedload(OrderItem.product).load_only(Product.name)
+
+    @staticmethod
+    def find(order_id, include_archived=False):
+        # Pedido por ID; el archivo solo se consulta si se pide expresamente
+        order = Order.query.options(Order.items_loader()).filter(Order.id == order_id).one_or_none()
+        if order is None and include_archived:
+            order = (ArchivedOrder.query
+                     .options(selectinload(ArchivedOrder.items)
+                              .joinedload(ArchivedOrderItem.product).load_only(Product.name))
+                     .filter(ArchivedOrder.id == order_id)
+                     .one_or_none())
+        return order
+
+class OrderItem(OrderItemSerializationMixin, db.Model):
+    __tablename__ = 'order_items'
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_price = db.Column(db.Float, nullable=False)
+
+    product = db.relationship('Product', backref='order_items', lazy=True)
+
+    # Como en Order: los ids archivados no se reutilizan en SQLite
+    __table_args__ = {'sqlite_autoincrement': True}
+
+# --- ARCHIVO DE PEDIDOS CERRADOS (los mueve shared/archive.py) ---
+# Mismas columnas que orders/order_items para copiarlas con INSERT ... SELECT; así las
+# tablas activas y sus índices solo contienen el historial reciente.
+class ArchivedOrder(OrderSerializationMixin, db.Model):
+    __tablename__ = 'orders_archive'
+    archived = True
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    customer_name = db.Column(db.String(100), nullable=False)
+    customer_address = db.Column(db.String(255), nullable=False)
+    customer_phone = db.Column(db.String(20), nullable=False)
+    customer_phone_digits = db.Column(db.String(20), nullable=True)
+    total_amount = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(50))
+    order_date = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    rollup_status = db.Column(db.String(50), nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    items = db.relationship('ArchivedOrderItem', backref='order', lazy=True)
+
+    __table_args__ = (
+        db.Index('ix_orders_archive_order_date_id', 'order_date', 'id'),
+    )
+
+class ArchivedOrderItem(OrderItemSerializationMixin, db.Model):
+    __tablename__ = 'order_items_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders_archive.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_price = db.Column(db.Float, nullable=False)
+
+    product = db.relationship('Product', lazy=True)
+
+# --- ROLLUPS DE VENTAS (se actualizan de forma incremental, ver shared/rollups.py) ---
+class OrderDailyRollup(db.Model):
+    __tablename__ = 'order_daily_rollups'
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class ProductDailyRollup(db.Model):
+    __tablename__ = 'product_daily_rollups'
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+    product = db.relationship('Product', lazy=True)
+
 # --- NUEVO MODELO PARA ADMINISTRADORES ---
 class AdminUser(db.Model):
     __tablename__ = 'admin_users'
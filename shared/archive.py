@@ -0,0 +1,53 @@
+# shared/archive.py
+# Mueve los pedidos cerrados (entregados o cancelados) sin cambios recientes de
+# orders/order_items a orders_archive/order_items_archive. El dashboard, el feed y
+# las búsquedas del panel solo consultan las tablas activas; el archivo se consulta
+# cuando se pide expresamente (vista "Pedidos archivados", Order.find(..., include_archived=True)).
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, literal, select
+
+from shared.models import db, Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+from shared.rollups import record_order_changes
+
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled')
+
+
+def _copy_rows(source, target, where, **values):
+    # INSERT INTO archivo (...) SELECT ... FROM activa, con las columnas de la tabla activa
+    # más los valores fijos indicados
+    columns = [column.name for column in source.__table__.columns]
+    selected = [source.__table__.c[name] for name in columns]
+    selected += [literal(value, type_=target.__table__.c[name].type) for name, value in values.items()]
+    return insert(target).from_select(columns + list(values), select(*selected).where(where))
+
+
+def archive_closed_orders(older_than_days, batch_size=1000, now=None):
+    # Devuelve cuántos pedidos se archivaron. Cada lote va en su propia transacción para
+    # no mantener bloqueadas muchas filas; en PostgreSQL se saltan las que otro está editando.
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=older_than_days)
+    archived = 0
+    while True:
+        ids = db.session.scalars(
+            select(Order.id)
+            .where(Order.status.in_(ARCHIVABLE_STATUSES), Order.updated_at < cutoff)
+            .order_by(Order.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not ids:
+            break
+        # Los rollups deben estar al día antes de que el pedido salga de la tabla activa
+        record_order_changes(ids)
+        db.session.execute(_copy_rows(Order, ArchivedOrder, Order.id.in_(ids), archived_at=now))
+        db.session.execute(_copy_rows(OrderItem, ArchivedOrderItem, OrderItem.order_id.in_(ids)))
+        db.session.execute(delete(OrderItem).where(OrderItem.order_id.in_(ids))
+                           .execution_options(synchronize_session=False))
+        db.session.execute(delete(Order).where(Order.id.in_(ids))
+                           .execution_options(synchronize_session=False))
+        db.session.commit()
+        archived += len(ids)
+        if len(ids) < batch_size:
+            break
+    return archived
@@ -0,0 +1,62 @@
+# shared/auth_cache.py
+# Caché en proceso de las identidades de administrador que usa Flask-Login en cada
+# petición HTTP y en cada evento Socket.IO, para no consultar admin_users cada vez.
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+
+class AdminIdentity(UserMixin):
+    # Lo que la app necesita de current_user; no es un objeto del ORM, así que se puede
+    # compartir entre peticiones sin sesión de base de datos
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+    def __repr__(self):
+        return f'<AdminIdentity {self.id} {self.username}>'
+
+
+class TTLCache:
+    # LRU con caducidad: como máximo `maxsize` entradas, cada una válida `ttl` segundos
+    def __init__(self, ttl=60, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        # Sube con cada invalidación: una carga que empezó antes no se guarda
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+            # La versión se toma antes de consultar: el loader puede ceder (gevent) y leer una fila
+            # que se borra o modifica mientras tanto
+            version = self.version
+        value = loader(key)
+        # Un usuario inexistente no se guarda: no ocupa sitio ni sobrevive a su creación
+        if value is not None and self.ttl > 0:
+            with self._lock:
+                if self.version != version:
+                    return value
+                self._entries[key] = (now + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self.version += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
@@ -0,0 +1,232 @@
+# shared/broadcast.py
+# Backends de difusión para Socket.IO: permiten que los eventos del dashboard
+# (new_order_alert, order_status_updated, ...) lleguen a los clientes conectados
+# a cualquier worker/host, no solo al proceso que hace el emit.
+import base64
+import json
+import logging
+import select
+import zlib
+
+import psycopg2
+import psycopg2.extensions
+from socketio import PubSubManager
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from shared.replay import LocalSequence, PostgresSequence
+
+logger = logging.getLogger('admin_app.broadcast')
+
+# PostgreSQL rechaza payloads de NOTIFY de 8000 bytes o más
+NOTIFY_MAX_BYTES = 7900
+COMPRESSED_PREFIX = 'z:'
+
+# Canales del backend en memoria: nombre de canal -> colas de los servidores suscritos
+_memory_channels = {}
+# Numeración de eventos compartida por los servidores de un mismo canal en memoria
+_memory_sequences = {}
+
+# Sala reservada para señales entre workers: nunca tiene clientes
+SIGNAL_ROOM = '__server_signals__'
+
+
+def _encode(data):
+    payload = json.dumps(data, separators=(',', ':'))
+    if len(payload.encode('utf-8')) <= NOTIFY_MAX_BYTES:
+        return payload
+    compressed = base64.b64encode(zlib.compress(payload.encode('utf-8'))).decode('ascii')
+    return COMPRESSED_PREFIX + compressed
+
+
+def _decode(payload):
+    if payload.startswith(COMPRESSED_PREFIX):
+        return zlib.decompress(base64.b64decode(payload[len(COMPRESSED_PREFIX):])).decode('utf-8')
+    return payload
+
+
+class ServerSignalsMixin:
+    # Señales entre workers (p. ej. invalidar cachés) que viajan por el mismo canal que los
+    # eventos del dashboard, como emits a SIGNAL_ROOM; no llegan a ningún cliente.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.signal_handlers = {}
+        # Sala -> manejador(evento, datos) para los emits publicados por otros workers
+        self.remote_emit_handlers = {}
+        self.event_sequence = LocalSequence()
+
+    def send_signal(self, name, data):
+        message = {'method': 'emit', 'event': name, 'data': data, 'namespace': '/',
+                   'room': SIGNAL_ROOM, 'skip_sid': None, 'callback': None, 'host_id': self.host_id}
+        self._handle_emit(message)
+        self._publish(message)
+
+    def _handle_emit(self, message):
+        if message.get('room') != SIGNAL_ROOM:
+            handler = self.remote_emit_handlers.get(message.get('room'))
+            if handler is not None and message.get('host_id') != self.host_id:
+                handler(message.get('event'), message.get('data'))
+            return super()._handle_emit(message)
+        handler = self.signal_handlers.get(message.get('event'))
+        if handler is not None:
+            handler(message.get('data'))
+
+
+class PostgresManager(ServerSignalsMixin, PubSubManager):
+    # Reparte los eventos entre workers con LISTEN/NOTIFY sobre la base de datos de Config
+    name = 'postgresql'
+
+    def __init__(self, url, channel='admin_dashboard_events', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        url = make_url(url).set(drivername='postgresql')
+        self.dsn = url.render_as_string(hide_password=False)
+        # Pool pequeño y propio para publicar, independiente de las sesiones de la app
+        self.engine = create_engine(self.dsn, pool_size=2, max_overflow=2, pool_pre_ping=True)
+        self.event_sequence = PostgresSequence(self.engine, channel)
+
+    def _publish(self, data):
+        payload = _encode(data)
+        if len(payload) > NOTIFY_MAX_BYTES:
+            logger.error('Mensaje de %s bytes demasiado grande para NOTIFY; no se difunde a otros workers',
+                         len(payload))
+            return
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text('SELECT pg_notify(:channel, :payload)'),
+                             {'channel': self.channel, 'payload': payload})
+                conn.commit()
+        except Exception:
+            logger.exception('No se pudo publicar en el canal %s', self.channel)
+
+    def _select(self):
+        # Sin monkey patching, select.select bloquearía el hub de gevent
+        if 'gevent' in self.server.async_mode:
+            from gevent import select as gevent_select
+            return gevent_select.select
+        return select.select
+
+    def _listen_connect(self):
+        conn = psycopg2.connect(self.dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return conn
+
+    def _listen(self):
+        wait = self._select()
+        retry_sleep = 1
+        while True:
+            conn = None
+            try:
+                conn = self._listen_connect()
+                retry_sleep = 1
+                while True:
+                    readable, _, _ = wait([conn], [], [], 5)
+                    if not readable:
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        yield _decode(notify.payload)
+            except psycopg2.Error:
+                logger.error('Se perdió la conexión LISTEN... reintentando en %s s', retry_sleep)
+                if conn is not None:
+                    conn.close()
+                self.server.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 60)
+
+
+class MemoryManager(ServerSignalsMixin, PubSubManager):
+    # Bus en memoria: varios servidores Socket.IO del mismo proceso comparten el canal.
+    # Pensado para pruebas y benchmarks que simulan varios workers.
+    name = 'memory'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.event_sequence = _memory_sequences.setdefault(self.channel, LocalSequence())
+
+    def initialize(self):
+        if not self.write_only:
+            self.queue = self.server.eio.create_queue()
+            _memory_channels.setdefault(self.channel, []).append(self.queue)
+        super().initialize()
+
+    def _publish(self, data):
+        payload = json.dumps(data, separators=(',', ':'))
+        for queue in list(_memory_channels.get(self.channel, ())):
+            queue.put(payload)
+
+    def _listen(self):
+        while True:
+            yield self.queue.get()
+
+
+def make_client_manager(config):
+    # Devuelve None si no se configura backend: Socket.IO usa su gestor local de un solo proceso
+    backend = (config.get('SOCKETIO_MESSAGE_QUEUE') or '').strip().lower()
+    channel = config.get('SOCKETIO_CHANNEL') or 'admin_dashboard_events'
+    if not backend:
+        return None
+    if backend in ('postgres', 'postgresql'):
+        return PostgresManager(config['SQLALCHEMY_DATABASE_URI'], channel=channel)
+    if backend == 'memory':
+        return MemoryManager(channel=channel)
+    raise ValueError(f'SOCKETIO_MESSAGE_QUEUE desconocido: {backend}')
+
+
+def _start_listening(socketio):
+    # El hilo que escucha el canal normalmente arranca con la primera conexión Socket.IO;
+    # las señales y eventos de otros workers deben recibirse aunque este aún no tenga clientes
+    if not socketio.server.manager_initialized:
+        socketio.server.manager_initialized = True
+        socketio.server.manager.initialize()
+
+
+def on_server_signal(socketio, name, handler):
+    # Registra un manejador de señal; sin backend de difusión solo hay un proceso
+    manager = socketio.server.manager
+    if isinstance(manager, ServerSignalsMixin):
+        manager.signal_handlers[name] = handler
+        _start_listening(socketio)
+    else:
+        _local_signal_handlers[name] = handler
+
+
+def on_remote_emit(socketio, room, handler):
+    # Recibe los emits a la sala hechos por otros workers; sin backend no hay otros workers
+    manager = socketio.server.manager
+    if isinstance(manager, ServerSignalsMixin):
+        manager.remote_emit_handlers[room] = handler
+        _start_listening(socketio)
+
+
+def publish_server_signal(config, name, data):
+    # Para procesos que no son workers (scripts/): publica la señal en el backend de PostgreSQL.
+    # Devuelve False si no hay un backend que llegue a otros procesos.
+    manager = make_client_manager(config)
+    if not isinstance(manager, PostgresManager):
+        return False
+    try:
+        manager.send_signal(name, data)
+    finally:
+        manager.engine.dispose()
+    return True
+
+
+def event_sequence(socketio):
+    # Numeración de eventos común a todos los workers del backend, o local al proceso
+    manager = socketio.server.manager
+    if isinstance(manager, ServerSignalsMixin):
+        return manager.event_sequence
+    return LocalSequence()
+
+
+def send_server_signal(socketio, name, data):
+    manager = socketio.server.manager
+    if isinstance(manager, ServerSignalsMixin):
+        manager.send_signal(name, data)
+    elif name in _local_signal_handlers:
+        _local_signal_handlers[name](data)
+
+
+_local_signal_handlers = {}
@@ -0,0 +1,39 @@
+# shared/catalog.py
+# Caché de lectura del catálogo de productos. Guarda el JSON ya serializado junto
+# con su ETag y se invalida subiendo la versión del catálogo cuando los productos
+# cambian desde el panel. El TTL acota cuánto puede durar un cambio hecho fuera del panel.
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+
+from shared.models import Product
+
+CatalogEntry = namedtuple('CatalogEntry', 'version expires body etag')
+
+
+class CatalogCache:
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.version = 0
+        self._entry = None
+        self._lock = threading.Lock()
+
+    def bump(self):
+        with self._lock:
+            self.version += 1
+
+    def get(self):
+        entry = self._entry
+        if entry is not None and entry.version == self.version and entry.expires > time.monotonic():
+            return entry
+        # La versión se toma antes de consultar: si cambia mientras tanto, la entrada nace obsoleta
+        version = self.version
+        products = Product.query.order_by(Product.id).all()
+        body = json.dumps([product.to_dict() for product in products],
+                          ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        # ETag fuerte a partir del contenido: es el mismo en todos los workers
+        entry = CatalogEntry(version, time.monotonic() + self.ttl, body, hashlib.sha256(body).hexdigest())
+        self._entry = entry
+        return entry
@@ -18,4 +18,39 @@ class Config:
     SQLALCHEMY_DATABASE_URI = (
         f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     )
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Pool de conexiones: tamaño, conexiones extra, espera máxima (s), reciclado (s) y verificación previa
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+    }
+    # Con gevent, psycopg2 cede el event loop mientras espera a PostgreSQL
+    DB_COOPERATIVE = os.getenv('DB_COOPERATIVE', 'true').lower() == 'true'
+
+    # Difusión de eventos Socket.IO entre workers: 'postgresql', 'memory' o vacío (un solo proceso)
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+    SOCKETIO_CHANNEL = os.getenv('SOCKETIO_CHANNEL', 'admin_dashboard_events')
+
+    # Ventana (segundos) en la que se agrupan las alertas de nuevos pedidos en un solo evento; 0 la desactiva
+    ORDER_ALERT_COALESCE_SECONDS = float(os.getenv('ORDER_ALERT_COALESCE_SECONDS', '0.5'))
+    # Máximo de IDs aceptados por /admin-api/new-order-notifications
+    ORDER_NOTIFICATION_BATCH_MAX = int(os.getenv('ORDER_NOTIFICATION_BATCH_MAX', '500'))
+    # Eventos del dashboard que se guardan para reenviarlos a los clientes que se reconectan
+    DASHBOARD_EVENT_BUFFER = int(os.getenv('DASHBOARD_EVENT_BUFFER', '500'))
+
+    # Pedidos entregados o cancelados sin cambios en estos días pasan al archivo (flask archive-orders)
+    ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', '30'))
+    ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv('ORDER_ARCHIVE_BATCH_SIZE', '1000'))
+
+    # Caché de identidades de administrador (segundos de vida y número máximo de entradas); TTL 0 la desactiva
+    ADMIN_USER_CACHE_TTL = int(os.getenv('ADMIN_USER_CACHE_TTL', '60'))
+    ADMIN_USER_CACHE_SIZE = int(os.getenv('ADMIN_USER_CACHE_SIZE', '1024'))
+
+    # Segundos máximos que se sirve el catálogo cacheado sin volver a consultarlo
+    CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', '300'))
+    # Filas por lote (y transacción) en la importación masiva de productos
+    PRODUCT_IMPORT_BATCH_SIZE = int(os.getenv('PRODUCT_IMPORT_BATCH_SIZE', '500'))
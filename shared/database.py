@@ -0,0 +1,97 @@
+# shared/database.py
+# Acceso a PostgreSQL compatible con gevent y pool de conexiones observable.
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+from sqlalchemy.pool import QueuePool
+
+
+def gevent_wait_callback(conn, timeout=None):
+    # Mientras psycopg2 espera al servidor, el greenlet cede el control al hub de gevent
+    # en lugar de bloquear a todos los clientes Socket.IO del worker
+    from gevent.socket import wait_read, wait_write
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f'Resultado inesperado de poll(): {state!r}')
+
+
+def make_psycopg2_cooperative():
+    extensions.set_wait_callback(gevent_wait_callback)
+
+
+def psycopg2_is_cooperative():
+    return extensions.get_wait_callback() is not None
+
+
+class PoolStats:
+    # Contadores de espera para obtener una conexión del pool
+    def __init__(self):
+        self.waiting = 0
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._lock = threading.Lock()
+
+    def begin_wait(self):
+        with self._lock:
+            self.waiting += 1
+
+    def end_wait(self, elapsed):
+        with self._lock:
+            self.waiting -= 1
+            self.checkouts += 1
+            self.total_wait += elapsed
+            self.max_wait = max(self.max_wait, elapsed)
+
+
+class InstrumentedQueuePool(QueuePool):
+    # QueuePool que mide cuánto se espera por cada conexión y cuántas peticiones esperan
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        self.stats.begin_wait()
+        try:
+            return super()._do_get()
+        finally:
+            self.stats.end_wait(time.perf_counter() - started)
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = {
+        'pool_class': type(pool).__name__,
+        'cooperative_driver': psycopg2_is_cooperative(),
+    }
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': pool.overflow(),
+        })
+    stats = getattr(pool, 'stats', None)
+    if stats is not None:
+        status.update({
+            'waiting': stats.waiting,
+            'checkouts': stats.checkouts,
+            'avg_wait_ms': stats.total_wait / stats.checkouts * 1000 if stats.checkouts else 0.0,
+            'max_wait_ms': stats.max_wait * 1000,
+        })
+    return status
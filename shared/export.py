@@ -0,0 +1,111 @@
+# shared/export.py
+# Exportación de pedidos + items (activos y archivados) en CSV o NDJSON. Las filas se
+# leen con un cursor del lado del servidor (yield_per / stream_results) y se generan por
+# bloques, así la memoria no depende de cuántas filas se exporten.
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, union_all
+
+from shared.models import db, Order, OrderItem, Product, ArchivedOrder, ArchivedOrderItem, ORDER_STATUSES
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_COLUMNS = (
+    'order_id', 'order_date', 'status', 'customer_name', 'customer_address', 'customer_phone',
+    'total_amount', 'item_id', 'product_id', 'product_name', 'quantity', 'unit_price',
+)
+# Filas leídas del cursor y escritas en cada bloque de la respuesta
+CHUNK_SIZE = 1000
+
+
+def parse_export_filters(status=None, date_from=None, date_to=None, include_archived=True):
+    # Mismos filtros que OrderAdminView.column_filters: estado y rango de order_date (fechas YYYY-MM-DD)
+    if status and status not in ORDER_STATUSES:
+        raise ValueError(f'Estado de pedido inválido: {status}')
+    try:
+        date_from = datetime.strptime(date_from, '%Y-%m-%d') if date_from else None
+        # date_to es inclusivo: se toma hasta el inicio del día siguiente
+        date_to = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1) if date_to else None
+    except ValueError:
+        raise ValueError('Las fechas deben tener el formato YYYY-MM-DD')
+    return {'status': status or None, 'date_from': date_from, 'date_to': date_to,
+            'include_archived': include_archived}
+
+
+def _order_rows(order_model, item_model, status, date_from, date_to):
+    # Solo columnas, sin objetos del ORM: un pedido sin items sale con los campos del item vacíos
+    stmt = (
+        select(
+            order_model.id.label('order_id'), order_model.order_date, order_model.status,
+            order_model.customer_name, order_model.customer_address, order_model.customer_phone,
+            order_model.total_amount, item_model.id.label('item_id'), item_model.product_id,
+            Product.name.label('product_name'), item_model.quantity, item_model.unit_price,
+        )
+        .select_from(order_model)
+        .outerjoin(item_model, item_model.order_id == order_model.id)
+        .outerjoin(Product, Product.id == item_model.product_id)
+    )
+    if status:
+        stmt = stmt.where(order_model.status == status)
+    if date_from:
+        stmt = stmt.where(order_model.order_date >= date_from)
+    if date_to:
+        stmt = stmt.where(order_model.order_date < date_to)
+    return stmt
+
+
+def export_statement(status=None, date_from=None, date_to=None, include_archived=True):
+    # Por defecto el historial completo, activo y archivado (como rebuild_rollups); los filtros
+    # se aplican en cada tabla para que cada una use sus índices
+    tables = [(Order, OrderItem)]
+    if include_archived:
+        tables.append((ArchivedOrder, ArchivedOrderItem))
+    rows = union_all(*[_order_rows(order_model, item_model, status, date_from, date_to)
+                       for order_model, item_model in tables]).subquery()
+    return select(*[rows.c[name] for name in EXPORT_COLUMNS]).order_by(
+        rows.c.order_date, rows.c.order_id, rows.c.item_id)
+
+
+def iter_export_rows(**filters):
+    result = db.session.execute(export_statement(**filters).execution_options(yield_per=CHUNK_SIZE))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+def _serialize(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def generate_csv(partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in partitions:
+        writer.writerows([_serialize(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def generate_ndjson(partitions):
+    for rows in partitions:
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, (_serialize(value) for value in row))), ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+
+def generate_export(export_format, **filters):
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Formato de exportación inválido: {export_format}')
+    partitions = iter_export_rows(**filters)
+    if export_format == 'csv':
+        return generate_csv(partitions)
+    return generate_ndjson(partitions)
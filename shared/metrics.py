@@ -0,0 +1,178 @@
+# shared/metrics.py
+# Instrumentación ligera en formato de texto de Prometheus. Cada worker lleva sus
+# propios contadores (listas de enteros/flotantes que se actualizan sin locks: bajo
+# gevent no hay cambio de greenlet en medio de una suma) y Prometheus los agrega.
+import os
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, help, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        # valores de etiquetas -> [cuenta por bucket..., +Inf, suma]
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series.setdefault(label_values, [0] * (len(self.buckets) + 1) + [0.0])
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, extra_labels):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for label_values, series in sorted(self._series.items()):
+            labels = list(zip(self.label_names, label_values)) + extra_labels
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(series[-1])}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, label_names):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self, extra_labels):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(self._values.items()):
+            labels = list(zip(self.label_names, label_values)) + extra_labels
+            lines.append(f'{self.name}{_format_labels(labels)} {_format_value(value)}')
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.http_duration = Histogram(
+            'admin_http_request_duration_seconds', 'Latencia de las rutas Flask.', ('endpoint', 'method'))
+        self.http_requests = Counter(
+            'admin_http_requests_total', 'Peticiones HTTP por ruta y código de estado.', ('endpoint', 'status'))
+        self.socket_duration = Histogram(
+            'admin_socketio_event_duration_seconds', 'Latencia de los manejadores Socket.IO.', ('event',))
+        self.sql_statements = Histogram(
+            'admin_sql_statements_per_request', 'Sentencias SQL por petición o evento.', ('handler',),
+            buckets=COUNT_BUCKETS)
+        self.sql_duration = Histogram(
+            'admin_sql_duration_seconds_per_request', 'Tiempo total en SQL por petición o evento.', ('handler',))
+        self.emit_recipients = Histogram(
+            'admin_socketio_emit_recipients', 'Clientes de este worker que reciben cada emit.', ('event',),
+            buckets=COUNT_BUCKETS)
+        # Métricas calculadas al momento de exportar: nombre -> (ayuda, función)
+        self.gauges = {}
+
+    def gauge(self, name, help, callback):
+        self.gauges[name] = (help, callback)
+
+    # --- SQL ---
+    def instrument_engine(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # En el contexto de la ejecución y no en la conexión: si la sentencia falla,
+        # after_cursor_execute no llega y no debe quedar nada pendiente en la conexión del pool
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_start', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if has_app_context():
+            stats = g.get('sql_stats')
+            if stats is not None:
+                stats[0] += 1
+                stats[1] += elapsed
+
+    def _start_handler(self):
+        g.sql_stats = [0, 0.0]
+        return time.perf_counter()
+
+    def _finish_handler(self, handler):
+        stats = g.pop('sql_stats', None)
+        if stats is not None:
+            self.sql_statements.observe(stats[0], handler)
+            self.sql_duration.observe(stats[1], handler)
+
+    # --- Flask ---
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        g.metrics_started = self._start_handler()
+
+    def _after_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            # La regla y no la URL: evita una serie por cada id o ruta inexistente
+            endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+            self.http_duration.observe(time.perf_counter() - started, endpoint, request.method)
+            self.http_requests.inc(endpoint, response.status_code)
+            self._finish_handler(endpoint)
+        return response
+
+    # --- Socket.IO ---
+    def timed_event(self, name):
+        def decorator(handler):
+            @wraps(handler)
+            def wrapper(*args, **kwargs):
+                started = self._start_handler()
+                try:
+                    return handler(*args, **kwargs)
+                finally:
+                    self.socket_duration.observe(time.perf_counter() - started, name)
+                    self._finish_handler(f'socketio:{name}')
+            return wrapper
+        return decorator
+
+    def observe_emit(self, event_name, recipients):
+        self.emit_recipients.observe(recipients, event_name)
+
+    # --- Exportación ---
+    def render(self):
+        extra_labels = [('worker', os.getpid())]
+        lines = []
+        for metric in (self.http_duration, self.http_requests, self.socket_duration,
+                       self.sql_statements, self.sql_duration, self.emit_recipients):
+            lines.extend(metric.render(extra_labels))
+        for name, (help, callback) in sorted(self.gauges.items()):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name}{_format_labels(extra_labels)} {_format_value(callback())}')
+        return '\n'.join(lines) + '\n'
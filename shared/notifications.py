@@ -0,0 +1,47 @@
+# shared/notifications.py
+# Agrupación de alertas de nuevos pedidos: las que llegan dentro de la ventana
+# configurada se envían al dashboard en un único evento 'new_order_alerts'.
+import threading
+
+
+class AlertCoalescer:
+    def __init__(self, socketio, window, event='new_order_alerts', room='admin_dashboard', emit=None):
+        self.socketio = socketio
+        self.window = window
+        self.event = event
+        self.room = room
+        # emit(event, data): permite enviar a través de un helper de la app en lugar de socketio.emit
+        self.emit = emit or (lambda event, data: socketio.emit(event, data, room=room))
+        self._pending = {}
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def add(self, alerts):
+        if not alerts:
+            return
+        if self.window <= 0:
+            self._emit(alerts)
+            return
+        with self._lock:
+            # Un mismo pedido notificado dos veces dentro de la ventana se envía una sola vez
+            for alert in alerts:
+                self._pending[alert['order_id']] = alert
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.socketio.start_background_task(self._flush_later)
+
+    def _flush_later(self):
+        self.socketio.sleep(self.window)
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            alerts = list(self._pending.values())
+            self._pending = {}
+            self._scheduled = False
+        self._emit(alerts)
+
+    def _emit(self, alerts):
+        if alerts:
+            self.emit(self.event, {'orders': alerts})
@@ -0,0 +1,137 @@
+# shared/orders.py
+# Operaciones sobre pedidos que afectan a muchas filas a la vez.
+import base64
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, select, tuple_, update
+
+from shared.models import db, Order, ORDER_STATUSES
+from shared.rollups import record_order_changes
+
+
+def bulk_update_status(changes, new_status):
+    # changes: lista de {'order_id': ..., 'version': ...}; la versión es opcional.
+    # Con versión, el pedido solo cambia si nadie lo modificó desde que el cliente lo vio.
+    # Devuelve (actualizados, conflictos) como listas de dicts con el estado actual de cada fila.
+    if new_status not in ORDER_STATUSES:
+        raise ValueError(f'Estado de pedido inválido: {new_status}')
+
+    versioned, unversioned = [], []
+    for change in changes:
+        order_id = int(change['order_id'])
+        version = change.get('version')
+        if version is None:
+            unversioned.append(order_id)
+        else:
+            versioned.append((order_id, int(version)))
+    if not versioned and not unversioned:
+        return [], []
+
+    conditions = []
+    if unversioned:
+        conditions.append(Order.id.in_(unversioned))
+    if versioned:
+        conditions.append(tuple_(Order.id, Order.version).in_(versioned))
+
+    # Un único UPDATE ... WHERE id IN (...) RETURNING para todo el lote
+    stmt = (
+        update(Order)
+        .where(or_(*conditions))
+        .values(status=new_status, version=Order.version + 1, updated_at=datetime.utcnow())
+        .returning(Order.id, Order.status, Order.version)
+        .execution_options(synchronize_session=False)
+    )
+    updated = [
+        {'order_id': row.id, 'new_status': row.status, 'version': row.version}
+        for row in db.session.execute(stmt)
+    ]
+    # Los rollups de ventas cambian en la misma transacción que el estado
+    record_order_changes([row['order_id'] for row in updated])
+    db.session.commit()
+
+    # Lo que no se actualizó cambió de versión (o no existe): se devuelve su estado actual
+    requested = set(unversioned) | {order_id for order_id, _ in versioned}
+    missing = requested - {row['order_id'] for row in updated}
+    conflicts = []
+    if missing:
+        rows = db.session.execute(
+            select(Order.id, Order.status, Order.version).where(Order.id.in_(missing))
+        )
+        conflicts = [
+            {'order_id': row.id, 'status': row.status, 'version': row.version}
+            for row in rows
+        ]
+    return updated, conflicts
+
+
+# --- Feed de pedidos con paginación por cursor ---
+# Un cursor es la pareja (fecha, id) de la última fila vista, codificada de forma opaca.
+
+# updated_at se asigna antes del commit: una transacción lenta puede hacerse visible con una
+# fecha anterior a la de un cursor ya entregado. El cursor de sincronización nunca pasa de
+# ahora - SYNC_OVERLAP, así la siguiente sincronización vuelve a leer esa ventana (el cliente
+# descarta los pedidos que ya tiene con la misma versión).
+SYNC_OVERLAP = timedelta(seconds=10)
+
+def encode_cursor(moment, order_id):
+    raw = json.dumps([moment.isoformat(), order_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        moment, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(moment), int(order_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError('Cursor inválido')
+
+
+def order_feed(cursor=None, limit=20):
+    # Página de pedidos del más reciente al más antiguo, a partir del cursor (excluido).
+    # Devuelve (pedidos, cursor_siguiente); el cursor es None cuando no quedan más.
+    query = Order.query.order_by(Order.order_date.desc(), Order.id.desc())
+    if cursor:
+        order_date, order_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Order.order_date, Order.id) < tuple_(order_date, order_id))
+    orders = query.limit(limit + 1).all()
+    if len(orders) <= limit:
+        return orders, None
+    orders = orders[:limit]
+    last = orders[-1]
+    return orders, encode_cursor(last.order_date, last.id)
+
+
+def _settled_cursor(updated_at, order_id, now=None):
+    # Posición como mucho en ahora - SYNC_OVERLAP
+    settled = (now or datetime.utcnow()) - SYNC_OVERLAP
+    if updated_at > settled:
+        return encode_cursor(settled, 0)
+    return encode_cursor(updated_at, order_id)
+
+
+def order_changes(since=None, limit=100, now=None):
+    # Pedidos creados o modificados después del cursor de sincronización, del más antiguo al más nuevo.
+    # Devuelve (pedidos, cursor_de_sincronización, hay_más). Las páginas intermedias avanzan hasta
+    # la última fila; solo la última se retrasa a la ventana de solape, para que la paginación termine.
+    query = Order.query.order_by(Order.updated_at, Order.id)
+    if since:
+        updated_at, order_id = decode_cursor(since)
+        query = query.filter(tuple_(Order.updated_at, Order.id) > tuple_(updated_at, order_id))
+    orders = query.limit(limit + 1).all()
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    if not orders:
+        return orders, since, has_more
+    last = orders[-1]
+    if has_more:
+        return orders, encode_cursor(last.updated_at, last.id), has_more
+    return orders, _settled_cursor(last.updated_at, last.id, now), has_more
+
+
+def current_sync_cursor(now=None):
+    # Cursor de la última modificación conocida: punto de partida de order_changes()
+    row = db.session.execute(
+        select(Order.updated_at, Order.id).order_by(Order.updated_at.desc(), Order.id.desc()).limit(1)
+    ).first()
+    return _settled_cursor(row.updated_at, row.id, now) if row else None
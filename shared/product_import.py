@@ -0,0 +1,403 @@
+# shared/product_import.py
+# Importación masiva de productos desde CSV o JSON (lista o un objeto por línea).
+# El archivo se lee por partes y cada fila se valida por separado; las válidas se
+# escriben por lotes (en PostgreSQL, COPY a una tabla temporal + INSERT ... ON CONFLICT;
+# en otros motores, executemany). Una fila inválida se reporta y no detiene la importación.
+#
+# Cada fila se asocia a un producto por 'id' o, si no lo trae, por nombre; si no existe
+# se crea. Los campos vacíos o ausentes no modifican el valor actual del producto, así
+# un archivo con solo 'id,price' sirve para actualizar precios.
+import csv
+import io
+import itertools
+import json
+
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from shared.database import psycopg2_is_cooperative
+from shared.models import db, Product
+
+IMPORT_FORMATS = ('csv', 'json')
+PRODUCT_FIELDS = ('name', 'price', 'description', 'image_url', 'is_available')
+# Campos obligatorios para crear un producto nuevo
+REQUIRED_FIELDS = ('name', 'price', 'description')
+# Encabezados en español aceptados en el CSV/JSON
+FIELD_ALIASES = {
+    'nombre': 'name', 'precio': 'price', 'descripcion': 'description', 'descripción': 'description',
+    'imagen': 'image_url', 'disponible': 'is_available',
+}
+TRUE_VALUES = ('1', 'true', 't', 'si', 'sí', 's', 'yes', 'y')
+FALSE_VALUES = ('0', 'false', 'f', 'no', 'n')
+
+DEFAULT_BATCH_SIZE = 500
+# Caracteres leídos del archivo en cada lectura
+READ_SIZE = 64 * 1024
+# Errores que se guardan con su mensaje; del resto solo se cuentan
+MAX_REPORTED_ERRORS = 1000
+STAGING_TABLE = 'product_import_staging'
+# En known_names: producto nuevo que está en el lote aún no escrito (todavía no tiene id)
+_PENDING_PRODUCT = object()
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        # [(línea o elemento, mensaje), ...]
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def to_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': [{'line': line, 'message': message} for line, message in self.errors],
+        }
+
+
+# --- Lectura ---
+def iter_csv_rows(stream):
+    # El delimitador se detecta en el encabezado: Excel en español guarda con ';'
+    header = stream.readline()
+    try:
+        dialect = csv.Sniffer().sniff(header, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(itertools.chain([header], stream), dialect=dialect)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _iter_ndjson(stream, buffer):
+    line = 0
+    while True:
+        chunk = stream.read(READ_SIZE)
+        buffer += chunk
+        lines = buffer.split('\n')
+        buffer = lines.pop() if chunk else ''
+        for raw in lines:
+            line += 1
+            if not raw.strip():
+                continue
+            try:
+                yield line, json.loads(raw)
+            except ValueError as e:
+                # Una línea ilegible es un error de esa fila, el resto se sigue leyendo
+                yield line, ValueError(f'JSON inválido: {e}')
+        if not chunk:
+            return
+
+
+def _iter_json_array(stream, buffer):
+    decoder = json.JSONDecoder()
+    buffer = buffer.lstrip()[1:]
+    eof = False
+    index = 0
+    # Después de cada elemento se espera ',' o ']'
+    after_value = False
+    while True:
+        buffer = buffer.lstrip()
+        if buffer:
+            if buffer[0] == ']':
+                return
+            if after_value:
+                if buffer[0] != ',':
+                    raise ValueError(f'JSON inválido después del elemento {index}')
+                buffer = buffer[1:]
+                after_value = False
+                continue
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except ValueError:
+                end = None
+            # Un valor que llega hasta el final del buffer puede estar cortado: se lee más antes
+            if end is not None and (end < len(buffer) or eof):
+                index += 1
+                yield index, value
+                buffer = buffer[end:]
+                after_value = True
+                continue
+        if eof:
+            raise ValueError(f'JSON inválido o incompleto después del elemento {index}')
+        chunk = stream.read(READ_SIZE)
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_json_rows(stream):
+    # Lista JSON ('[{...}, ...]') o un objeto por línea (NDJSON), sin cargar el archivo entero
+    buffer = stream.read(READ_SIZE)
+    if buffer.lstrip().startswith('['):
+        return _iter_json_array(stream, buffer)
+    return _iter_ndjson(stream, buffer)
+
+
+def iter_rows(stream, import_format):
+    if import_format == 'csv':
+        return iter_csv_rows(stream)
+    if import_format == 'json':
+        return iter_json_rows(stream)
+    raise ValueError(f'Formato de importación desconocido: {import_format}')
+
+
+def format_from_filename(filename):
+    return 'json' if (filename or '').lower().endswith(('.json', '.jsonl', '.ndjson')) else 'csv'
+
+
+# --- Validación ---
+def _clean(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _parse_price(value):
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, str) and ',' in value and '.' not in value:
+        # '12,50' con coma decimal
+        value = value.replace(',', '.')
+    price = float(value)
+    if not 0 <= price < float('inf'):
+        raise ValueError
+    return price
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text_value = str(value).strip().lower()
+    if text_value in TRUE_VALUES:
+        return True
+    if text_value in FALSE_VALUES:
+        return False
+    raise ValueError
+
+
+def _name_key(name):
+    return name.casefold()
+
+
+def validate_row(raw, known_ids, known_names):
+    # Devuelve {'id': ..., campo: valor, ...} solo con los campos que trae la fila.
+    # known_ids: IDs existentes; known_names: nombre normalizado -> id (None si se repite,
+    # _PENDING_PRODUCT si lo crea el lote en curso: la fila se devuelve con ese id).
+    if isinstance(raw, ValueError):
+        raise raw
+    if not isinstance(raw, dict):
+        raise ValueError('Cada fila debe ser un objeto con los campos del producto')
+    row = {}
+    for key, value in raw.items():
+        if key is None:
+            raise ValueError('La fila tiene más columnas que el encabezado')
+        key = key.strip().lower()
+        row[FIELD_ALIASES.get(key, key)] = _clean(value)
+
+    values = {}
+    product_id = row.get('id')
+    if product_id is not None:
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            raise ValueError(f'id inválido: {product_id!r}')
+        if product_id not in known_ids:
+            raise ValueError(f'No existe el producto con id {product_id}')
+
+    if row.get('name') is not None:
+        values['name'] = str(row['name'])
+        if len(values['name']) > Product.name.type.length:
+            raise ValueError(f'name supera los {Product.name.type.length} caracteres')
+    if row.get('price') is not None:
+        try:
+            values['price'] = _parse_price(row['price'])
+        except (TypeError, ValueError):
+            raise ValueError(f'price inválido: {row["price"]!r}')
+    if row.get('description') is not None:
+        values['description'] = str(row['description'])
+    if row.get('image_url') is not None:
+        values['image_url'] = str(row['image_url'])
+        if len(values['image_url']) > Product.image_url.type.length:
+            raise ValueError(f'image_url supera los {Product.image_url.type.length} caracteres')
+    if row.get('is_available') is not None:
+        try:
+            values['is_available'] = _parse_bool(row['is_available'])
+        except ValueError:
+            raise ValueError(f'is_available inválido: {row["is_available"]!r}')
+
+    if product_id is None and 'name' in values:
+        key = _name_key(values['name'])
+        if key in known_names:
+            product_id = known_names[key]
+            if product_id is None:
+                raise ValueError(f'Hay varios productos llamados {values["name"]!r}; indica el id')
+    if product_id is None:
+        missing = [field for field in REQUIRED_FIELDS if field not in values]
+        if missing:
+            raise ValueError(f'Faltan campos para crear el producto: {", ".join(missing)}')
+        values.setdefault('image_url', None)
+        values.setdefault('is_available', True)
+    elif len(values) == 0:
+        raise ValueError('La fila no trae ningún campo que actualizar')
+    values['id'] = product_id
+    return values
+
+
+# --- Escritura ---
+def _load_known_products():
+    known_ids = set()
+    known_names = {}
+    for product_id, name in db.session.execute(select(Product.id, Product.name)):
+        known_ids.add(product_id)
+        key = _name_key(name)
+        known_names[key] = None if key in known_names else product_id
+    return known_ids, known_names
+
+
+def _write_rows(rows):
+    # Ruta genérica (executemany): UPDATE por id de los existentes e INSERT de los nuevos.
+    # Devuelve [(id, nombre o None, creado), ...]
+    written = []
+    updates = [values for _, values in rows if values['id'] is not None]
+    if updates:
+        # Agrupados por campos presentes: cada grupo es un executemany
+        groups = {}
+        for values in updates:
+            groups.setdefault(tuple(sorted(values)), []).append(values)
+        for group in groups.values():
+            db.session.execute(update(Product), group)
+        written += [(values['id'], values.get('name'), False) for values in updates]
+    inserts = [{field: values[field] for field in PRODUCT_FIELDS} for _, values in rows if values['id'] is None]
+    if inserts:
+        result = db.session.execute(
+            insert(Product).returning(Product.id, Product.name, sort_by_parameter_order=True), inserts
+        )
+        written += [(product_id, name, True) for product_id, name in result]
+    return written
+
+
+def _load_staging(conn, rows):
+    columns = ('line', 'id') + PRODUCT_FIELDS
+    records = [[line, values['id']] + [values.get(field) for field in PRODUCT_FIELDS] for line, values in rows]
+    if psycopg2_is_cooperative():
+        # psycopg2 no admite COPY con el wait callback de gevent: INSERT con executemany
+        conn.execute(
+            text(f'INSERT INTO {STAGING_TABLE} ({", ".join(columns)}) '
+                 f'VALUES ({", ".join(":" + column for column in columns)})'),
+            [dict(zip(columns, record)) for record in records]
+        )
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in records:
+        # En COPY ... CSV un campo vacío sin comillas es NULL
+        writer.writerow(['' if value is None else ('t' if value is True else 'f' if value is False else value)
+                         for value in record])
+    buffer.seek(0)
+    with conn.connection.dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {STAGING_TABLE} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def _upsert_postgresql(rows):
+    conn = db.session.connection()
+    conn.execute(text(f'''
+        CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+            line integer, id integer, name varchar(100), price double precision,
+            description text, image_url varchar(255), is_available boolean
+        ) ON COMMIT DROP
+    '''))
+    _load_staging(conn, rows)
+    # Los campos vacíos toman el valor actual del producto; los nuevos reciben id de la secuencia
+    result = conn.execute(text(f'''
+        INSERT INTO products (id, name, price, description, image_url, is_available)
+        SELECT COALESCE(s.id, nextval(pg_get_serial_sequence('products', 'id'))),
+               COALESCE(s.name, p.name), COALESCE(s.price, p.price),
+               COALESCE(s.description, p.description), COALESCE(s.image_url, p.image_url),
+               COALESCE(s.is_available, p.is_available)
+        FROM {STAGING_TABLE} s
+        LEFT JOIN products p ON p.id = s.id
+        ORDER BY s.line
+        ON CONFLICT (id) DO UPDATE SET
+            name = EXCLUDED.name, price = EXCLUDED.price, description = EXCLUDED.description,
+            image_url = EXCLUDED.image_url, is_available = EXCLUDED.is_available
+        RETURNING id, name, (xmax = 0) AS created
+    '''))
+    return [(product_id, name, created) for product_id, name, created in result]
+
+
+def _write_batch(rows, report, known_ids, known_names):
+    # Los nombres pendientes del lote pasan a tener su id (o dejan de existir si la fila falla)
+    for _, values in rows:
+        if values['id'] is None:
+            known_names.pop(_name_key(values['name']), None)
+    dialect = db.session.get_bind().dialect.name
+    try:
+        with db.session.begin_nested():
+            written = _upsert_postgresql(rows) if dialect == 'postgresql' else _write_rows(rows)
+    except SQLAlchemyError:
+        # Se repite fila a fila para reportar solo las que fallan
+        written = []
+        for line, values in rows:
+            try:
+                with db.session.begin_nested():
+                    written += _write_rows([(line, values)])
+            except SQLAlchemyError as e:
+                report.add_error(line, str(getattr(e, 'orig', None) or e).strip().splitlines()[0])
+    db.session.commit()
+
+    for product_id, name, created in written:
+        if created:
+            report.created += 1
+        else:
+            report.updated += 1
+        known_ids.add(product_id)
+        if name is not None:
+            known_names[_name_key(name)] = product_id
+
+
+def import_products(stream, import_format, batch_size=DEFAULT_BATCH_SIZE):
+    # stream: archivo de texto. Cada lote va en su propia transacción.
+    report = ImportReport()
+    known_ids, known_names = _load_known_products()
+    batch = []
+    keys = set()
+    line = 0
+    try:
+        for line, raw in iter_rows(stream, import_format):
+            try:
+                values = validate_row(raw, known_ids, known_names)
+                if values['id'] is _PENDING_PRODUCT:
+                    # Actualiza un producto que crea el lote en curso: se escribe el lote y la fila
+                    # se vuelve a validar con el id ya asignado
+                    _write_batch(batch, report, known_ids, known_names)
+                    batch = []
+                    keys = set()
+                    values = validate_row(raw, known_ids, known_names)
+            except ValueError as e:
+                report.add_error(line, str(e))
+                continue
+            # Dos filas del mismo producto no pueden ir en el mismo INSERT ... ON CONFLICT
+            key = values['id'] if values['id'] is not None else _name_key(values['name'])
+            if key in keys or len(batch) >= batch_size:
+                _write_batch(batch, report, known_ids, known_names)
+                batch = []
+                keys = set()
+            batch.append((line, values))
+            keys.add(key)
+            if values['id'] is None:
+                known_names[key] = _PENDING_PRODUCT
+    except (ValueError, csv.Error) as e:
+        # Archivo ilegible a partir de este punto: se guarda lo leído hasta aquí
+        report.add_error(line, str(e))
+    if batch:
+        _write_batch(batch, report, known_ids, known_names)
+    return report
@@ -0,0 +1,86 @@
+# shared/replay.py
+# Reenvío de eventos perdidos del dashboard: cada evento lleva un número de secuencia
+# y los últimos se guardan en un buffer circular. Un cliente que se reconecta envía el
+# último que vio y recibe solo los que faltan, o una indicación de "resync" si ya no
+# están en el buffer.
+import itertools
+import threading
+import uuid
+from collections import deque
+
+from sqlalchemy import text
+
+
+class LocalSequence:
+    # Contador del proceso; la época cambia en cada arranque para que los clientes
+    # no confundan la numeración nueva con la anterior
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:12]
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            return next(self._counter)
+
+
+class PostgresSequence:
+    # Secuencia de PostgreSQL compartida por todos los workers que usan el mismo canal
+    def __init__(self, engine, channel):
+        self.engine = engine
+        self.name = f'{channel}_seq'
+        self.epoch = channel
+        self._created = False
+
+    def next(self):
+        with self.engine.connect() as conn:
+            if not self._created:
+                conn.execute(text(f'CREATE SEQUENCE IF NOT EXISTS "{self.name}"'))
+                self._created = True
+            seq = conn.execute(text('SELECT nextval(:name)'), {'name': f'"{self.name}"'}).scalar()
+            conn.commit()
+        return seq
+
+
+class EventLog:
+    def __init__(self, size, sequence=None):
+        self.sequence = sequence or LocalSequence()
+        # (seq, evento, datos) ordenados por seq; los más antiguos se descartan solos
+        self._events = deque(maxlen=size)
+        self._latest = 0
+        self._lock = threading.Lock()
+
+    @property
+    def epoch(self):
+        return self.sequence.epoch
+
+    @property
+    def latest(self):
+        return self._latest
+
+    def stamp(self, data):
+        # Copia de los datos con el número de secuencia que verá el cliente
+        return dict(data, seq=self.sequence.next(), epoch=self.epoch)
+
+    def record(self, event, data):
+        seq = data.get('seq')
+        if seq is None or data.get('epoch') != self.epoch:
+            return
+        with self._lock:
+            self._events.append((seq, event, data))
+            if seq < self._latest:
+                # Entre workers el orden de llegada puede diferir del de asignación
+                self._events = deque(sorted(self._events, key=lambda item: item[0]),
+                                     maxlen=self._events.maxlen)
+            self._latest = max(self._latest, seq)
+
+    def since(self, epoch, last_seq):
+        # Devuelve [(evento, datos), ...] posteriores a last_seq, o None si hace falta resync
+        with self._lock:
+            if epoch != self.epoch or last_seq > self._latest:
+                return None
+            if last_seq == self._latest:
+                return []
+            if not self._events or self._events[0][0] > last_seq + 1:
+                return None
+            return [(event, data) for seq, event, data in self._events if seq > last_seq]
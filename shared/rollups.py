@@ -0,0 +1,233 @@
+# shared/rollups.py
+# Rollups de ventas por día/estado y por día/producto/estado. Se mantienen de forma
+# incremental cuando un pedido se notifica o cambia de estado, y se pueden reconstruir
+# desde cero con rebuild_rollups(). Los reportes leen solo estas tablas.
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, or_, select, text, union_all, update
+from sqlalchemy.orm import selectinload
+
+from shared.models import (db, Order, OrderItem, Product, OrderDailyRollup, ProductDailyRollup,
+                           ArchivedOrder, ArchivedOrderItem)
+
+# Estados que no cuentan como venta en los reportes
+EXCLUDED_STATUSES = ('cancelled',)
+
+
+def _dialect_insert(model):
+    name = db.session.get_bind().dialect.name
+    if name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(model)
+
+
+def _add_to_rollup(model, key_columns, rows):
+    # Suma los valores de cada fila a la fila existente con la misma clave (o la crea)
+    if not rows:
+        return
+    value_columns = [name for name in rows[0] if name not in key_columns]
+    stmt = _dialect_insert(model)
+    if stmt is not None:
+        stmt = stmt.values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={name: getattr(model, name) + stmt.excluded[name] for name in value_columns}
+        )
+        db.session.execute(stmt)
+        return
+    for row in rows:
+        existing = db.session.get(model, tuple(row[name] for name in key_columns))
+        if existing is None:
+            db.session.add(model(**row))
+        else:
+            for name in value_columns:
+                setattr(existing, name, getattr(existing, name) + row[name])
+
+
+def record_order_changes(order_ids):
+    # Lleva a los rollups los pedidos nuevos o cuyo estado cambió desde la última vez.
+    # Es idempotente (usa Order.rollup_status) y no hace commit: va en la transacción del llamador.
+    if not order_ids:
+        return
+    orders = (
+        Order.query
+        .options(selectinload(Order.items))
+        .filter(Order.id.in_(order_ids))
+        .filter(or_(Order.rollup_status.is_(None), Order.rollup_status != Order.status))
+        .with_for_update()
+        .all()
+    )
+    if not orders:
+        return
+
+    order_deltas = defaultdict(lambda: [0, 0.0])
+    product_deltas = defaultdict(lambda: [0, 0.0])
+    counted = defaultdict(list)
+    for order in orders:
+        day = order.order_date.date()
+        # Se resta del estado contabilizado antes y se suma al actual
+        for status, sign in ((order.rollup_status, -1), (order.status, 1)):
+            if status is None:
+                continue
+            order_delta = order_deltas[(day, status)]
+            order_delta[0] += sign
+            order_delta[1] += sign * order.total_amount
+            for item in order.items:
+                product_delta = product_deltas[(day, item.product_id, status)]
+                product_delta[0] += sign * item.quantity
+                product_delta[1] += sign * item.quantity * item.unit_price
+        counted[order.status].append(order.id)
+
+    _add_to_rollup(OrderDailyRollup, ['day', 'status'], [
+        {'day': day, 'status': status, 'order_count': count, 'revenue': revenue}
+        for (day, status), (count, revenue) in order_deltas.items()
+    ])
+    _add_to_rollup(ProductDailyRollup, ['day', 'product_id', 'status'], [
+        {'day': day, 'product_id': product_id, 'status': status, 'quantity': quantity, 'revenue': revenue}
+        for (day, product_id, status), (quantity, revenue) in product_deltas.items()
+    ])
+    # Sin pasar por el ORM para no incrementar version ni updated_at
+    for status, ids in counted.items():
+        db.session.execute(
+            update(Order)
+            .where(Order.id.in_(ids))
+            .values(rollup_status=status, updated_at=Order.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def forget_orders(order_ids):
+    # Resta de los rollups lo contabilizado para estos pedidos y los deja pendientes (rollup_status NULL).
+    # Se usa antes de editar fecha, importe o items, o de borrar: lee los valores guardados en la base
+    # de datos, no los del ORM, que pueden estar ya modificados. Después, record_order_changes() vuelve
+    # a sumar el pedido con sus valores nuevos. No hace commit.
+    if not order_ids:
+        return
+    with db.session.no_autoflush:
+        orders = db.session.execute(
+            select(Order.id, Order.order_date, Order.total_amount, Order.rollup_status)
+            .where(Order.id.in_(order_ids), Order.rollup_status.is_not(None))
+            .with_for_update()
+        ).all()
+        if not orders:
+            return
+        items = defaultdict(list)
+        for item in db.session.execute(
+            select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.unit_price)
+            .where(OrderItem.order_id.in_([order.id for order in orders]))
+        ):
+            items[item.order_id].append(item)
+
+        order_deltas = defaultdict(lambda: [0, 0.0])
+        product_deltas = defaultdict(lambda: [0, 0.0])
+        for order in orders:
+            day = order.order_date.date()
+            order_delta = order_deltas[(day, order.rollup_status)]
+            order_delta[0] -= 1
+            order_delta[1] -= order.total_amount
+            for item in items[order.id]:
+                product_delta = product_deltas[(day, item.product_id, order.rollup_status)]
+                product_delta[0] -= item.quantity
+                product_delta[1] -= item.quantity * item.unit_price
+
+        _add_to_rollup(OrderDailyRollup, ['day', 'status'], [
+            {'day': day, 'status': status, 'order_count': count, 'revenue': revenue}
+            for (day, status), (count, revenue) in order_deltas.items()
+        ])
+        _add_to_rollup(ProductDailyRollup, ['day', 'product_id', 'status'], [
+            {'day': day, 'product_id': product_id, 'status': status, 'quantity': quantity, 'revenue': revenue}
+            for (day, product_id, status), (quantity, revenue) in product_deltas.items()
+        ])
+        db.session.execute(
+            update(Order)
+            .where(Order.id.in_([order.id for order in orders]))
+            .values(rollup_status=None, updated_at=Order.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def rebuild_rollups():
+    # Recalcula todos los rollups a partir del historial completo (activo y archivado)
+    # en una sola transacción
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(text('LOCK TABLE orders, orders_archive, order_daily_rollups, product_daily_rollups '
+                                'IN EXCLUSIVE MODE'))
+    db.session.execute(delete(ProductDailyRollup))
+    db.session.execute(delete(OrderDailyRollup))
+
+    orders = union_all(*[
+        select(model.id, model.order_date, model.status, model.total_amount).where(model.status.is_not(None))
+        for model in (Order, ArchivedOrder)
+    ]).subquery()
+    items = union_all(*[
+        select(model.order_id, model.product_id, model.quantity, model.unit_price)
+        for model in (OrderItem, ArchivedOrderItem)
+    ]).subquery()
+
+    day = func.date(orders.c.order_date)
+    db.session.execute(insert(OrderDailyRollup).from_select(
+        ['day', 'status', 'order_count', 'revenue'],
+        select(day, orders.c.status, func.count(orders.c.id), func.sum(orders.c.total_amount))
+        .group_by(day, orders.c.status)
+    ))
+    db.session.execute(insert(ProductDailyRollup).from_select(
+        ['day', 'product_id', 'status', 'quantity', 'revenue'],
+        select(day, items.c.product_id, orders.c.status,
+               func.sum(items.c.quantity), func.sum(items.c.quantity * items.c.unit_price))
+        .join(orders, items.c.order_id == orders.c.id)
+        .group_by(day, items.c.product_id, orders.c.status)
+    ))
+    for model in (Order, ArchivedOrder):
+        db.session.execute(
+            update(model)
+            .values(rollup_status=model.status, updated_at=model.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+
+
+def sales_summary(days=7, top_products=5, today=None):
+    # Datos del panel de analítica, leídos solo de los rollups (días en UTC, como order_date)
+    today = today or datetime.utcnow().date()
+    since = today - timedelta(days=days - 1)
+
+    daily = {since + timedelta(days=offset): {'orders': 0, 'revenue': 0.0} for offset in range(days)}
+    rows = db.session.execute(
+        select(OrderDailyRollup.day, func.sum(OrderDailyRollup.order_count), func.sum(OrderDailyRollup.revenue))
+        .where(OrderDailyRollup.day >= since, OrderDailyRollup.status.not_in(EXCLUDED_STATUSES))
+        .group_by(OrderDailyRollup.day)
+    )
+    for day, order_count, revenue in rows:
+        if day in daily:
+            daily[day] = {'orders': order_count or 0, 'revenue': revenue or 0.0}
+
+    by_status = dict(db.session.execute(
+        select(OrderDailyRollup.status, func.sum(OrderDailyRollup.order_count))
+        .where(OrderDailyRollup.day == today)
+        .group_by(OrderDailyRollup.status)
+    ).all())
+
+    revenue = func.sum(ProductDailyRollup.revenue)
+    products = db.session.execute(
+        select(Product.name, func.sum(ProductDailyRollup.quantity), revenue)
+        .join(Product, Product.id == ProductDailyRollup.product_id)
+        .where(ProductDailyRollup.day >= since, ProductDailyRollup.status.not_in(EXCLUDED_STATUSES))
+        .group_by(Product.id, Product.name)
+        .order_by(revenue.desc())
+        .limit(top_products)
+    ).all()
+
+    return {
+        'days': days,
+        'daily': [{'day': day, **values} for day, values in sorted(daily.items())],
+        'by_status': by_status,
+        'top_products': [
+            {'name': name, 'quantity': quantity or 0, 'revenue': product_revenue or 0.0}
+            for name, quantity, product_revenue in products
+        ],
+    }
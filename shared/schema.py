@@ -0,0 +1,112 @@
+# shared/schema.py
+# Cambios de esquema idempotentes para bases de datos creadas antes de que
+# existieran algunas columnas/índices. db.create_all() solo crea tablas nuevas,
+# no altera las existentes.
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateTable
+
+from shared.models import db, normalize_phone
+
+
+def _backfill_phone_digits(conn):
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text(
+            "UPDATE orders SET customer_phone_digits = regexp_replace(customer_phone, '\\D', '', 'g')"
+        ))
+        return
+    rows = conn.execute(text('SELECT id, customer_phone FROM orders')).all()
+    if rows:
+        conn.execute(
+            text('UPDATE orders SET customer_phone_digits = :digits WHERE id = :id'),
+            [{'id': row.id, 'digits': normalize_phone(row.customer_phone)} for row in rows]
+        )
+
+
+# En PostgreSQL customer_phone_digits lo calcula la base de datos: también para los INSERT/UPDATE
+# que no pasan por el ORM (Core, executemany, la tienda). En SQLite lo mantiene Order._sync_phone_digits.
+PHONE_DIGITS_TRIGGER = [
+    r'''
+    CREATE OR REPLACE FUNCTION orders_sync_phone_digits() RETURNS trigger AS $$
+    BEGIN
+        NEW.customer_phone_digits := regexp_replace(NEW.customer_phone, '\D', '', 'g');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    'DROP TRIGGER IF EXISTS orders_sync_phone_digits ON orders',
+    '''
+    CREATE TRIGGER orders_sync_phone_digits
+    BEFORE INSERT OR UPDATE OF customer_phone, customer_phone_digits ON orders
+    FOR EACH ROW EXECUTE PROCEDURE orders_sync_phone_digits()
+    ''',
+]
+
+
+# Tablas activas y su archivo. En SQLite las activas necesitan AUTOINCREMENT: sin él, al archivar
+# los pedidos con los ids más altos esos ids se vuelven a dar a pedidos nuevos.
+ARCHIVED_TABLES = [('orders', 'orders_archive'), ('order_items', 'order_items_archive')]
+
+
+def _sqlite_autoincrement(conn):
+    for table_name, archive_name in ARCHIVED_TABLES:
+        created = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                               {'name': table_name}).scalar()
+        if 'AUTOINCREMENT' not in created.upper():
+            # SQLite no permite añadirlo con ALTER TABLE: se rehace la tabla con los mismos datos
+            # (los índices se vuelven a crear al final de upgrade_schema)
+            table = db.metadata.tables[table_name]
+            columns = ', '.join(column.name for column in table.columns)
+            ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+            conn.execute(text(ddl.replace(f'CREATE TABLE {table_name} ', f'CREATE TABLE {table_name}_new ', 1)))
+            conn.execute(text(f'INSERT INTO {table_name}_new ({columns}) SELECT {columns} FROM {table_name}'))
+            conn.execute(text(f'DROP TABLE {table_name}'))
+            conn.execute(text(f'ALTER TABLE {table_name}_new RENAME TO {table_name}'))
+        # El contador empieza después del id más alto ya usado, también entre los archivados
+        archived = conn.execute(text(f'SELECT MAX(id) FROM {archive_name}')).scalar()
+        if archived is None:
+            continue
+        counted = conn.execute(text('SELECT seq FROM sqlite_sequence WHERE name = :name'),
+                               {'name': table_name}).scalar()
+        if counted is None:
+            conn.execute(text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)'),
+                         {'name': table_name, 'seq': archived})
+        elif counted < archived:
+            conn.execute(text('UPDATE sqlite_sequence SET seq = :seq WHERE name = :name'),
+                         {'name': table_name, 'seq': archived})
+
+
+# (tabla, columna, DDL de la columna, relleno opcional de filas existentes: SQL o función(conn))
+COLUMN_UPGRADES = [
+    ('orders', 'version', 'INTEGER NOT NULL DEFAULT 1', None),
+    ('orders', 'updated_at', 'TIMESTAMP', 'UPDATE orders SET updated_at = order_date WHERE updated_at IS NULL'),
+    ('orders', 'customer_phone_digits', 'VARCHAR(20)', _backfill_phone_digits),
+    ('orders', 'rollup_status', 'VARCHAR(50)', None),
+]
+
+
+def upgrade_schema(engine=None):
+    engine = engine or db.engine
+    if engine.dialect.name == 'postgresql':
+        # Necesaria antes de crear los índices gin_trgm_ops de las búsquedas
+        with engine.begin() as conn:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table, column, ddl, backfill in COLUMN_UPGRADES:
+            existing = {c['name'] for c in inspector.get_columns(table)}
+            if column not in existing:
+                conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+                if callable(backfill):
+                    backfill(conn)
+                elif backfill:
+                    conn.execute(text(backfill))
+        if conn.dialect.name == 'sqlite':
+            _sqlite_autoincrement(conn)
+        # create_all no añade índices nuevos a tablas que ya existían
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        if conn.dialect.name == 'postgresql':
+            for statement in PHONE_DIGITS_TRIGGER:
+                conn.execute(text(statement))
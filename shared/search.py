@@ -0,0 +1,37 @@
+# shared/search.py
+# Búsqueda de pedidos para el panel de administración. En PostgreSQL los ILIKE
+# '%término%' se resuelven con los índices trigram de orders; el teléfono se
+# compara contra la columna normalizada a dígitos, así '0412-555' encuentra '(0412) 555...'.
+import re
+
+from sqlalchemy import or_
+
+from shared.models import Order, normalize_phone
+
+# Con menos dígitos el término no se trata como teléfono (y pg_trgm no usaría el índice)
+PHONE_SEARCH_MIN_DIGITS = 3
+PHONE_TERM = re.compile(r'^[\d\s()+.\-]+$')
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def order_search_clause(term, model=Order):
+    # model: Order o ArchivedOrder, que comparten las columnas de búsqueda
+    pattern = f'%{escape_like(term)}%'
+    conditions = [
+        model.customer_name.ilike(pattern, escape='\\'),
+        model.customer_address.ilike(pattern, escape='\\'),
+    ]
+    digits = normalize_phone(term)
+    if len(digits) >= PHONE_SEARCH_MIN_DIGITS and PHONE_TERM.match(term):
+        conditions.append(model.customer_phone_digits.like(f'%{digits}%'))
+    return or_(*conditions)
+
+
+def apply_order_search(query, search, model=Order):
+    # Cada palabra debe coincidir en alguno de los campos, como en la búsqueda de Flask-Admin
+    for term in search.split():
+        query = query.filter(order_search_clause(term, model))
+    return query
@@ -1,11 +1,29 @@
 // admin_app/static/js/admin.js
 document.addEventListener('DOMContentLoaded', () => {
-    // Conéctate al servidor Socket.IO en el mismo host y puerto que la app de administración
-    // Si la app admin está en localhost:5001, se conectará allí por defecto.
-    const socket = io();
-
     const notificationArea = document.getElementById('notificationArea');
     const ordersList = document.getElementById('ordersList');
+    // Eventos del dashboard aplicados: todos hasta lastEventSeq, más los posteriores que llegaron
+    // antes de tiempo (con varios workers los números no llegan en orden). Al reconectar se piden
+    // los posteriores a lastEventSeq, así también se recuperan los huecos.
+    let eventEpoch = ordersList.dataset.eventEpoch || null;
+    let lastEventSeq = Number(ordersList.dataset.eventSeq || 0);
+    let seenEventSeqs = new Set();
+    // Un hueco más antiguo que esto se da por perdido (p. ej. un número de la secuencia sin evento)
+    const EVENT_SEQ_WINDOW = 1000;
+
+    // Conéctate al servidor Socket.IO en el mismo host y puerto que la app de administración
+    // Si la app admin está en localhost:5001, se conectará allí por defecto.
+    // Solo websocket: con varios workers de gunicorn el long-polling necesitaría sesiones "sticky"
+    // auth se evalúa en cada (re)conexión, así el servidor sabe desde dónde reenviar
+    const socket = io({
+        transports: ['websocket'],
+        auth: (cb) => cb({ epoch: eventEpoch, last_seq: lastEventSeq })
+    });
+    const ordersListEnd = document.getElementById('ordersListEnd');
+    // Cursores del feed: siguiente página hacia atrás y última modificación sincronizada
+    let nextCursor = ordersList.dataset.nextCursor || null;
+    let syncCursor = ordersList.dataset.syncCursor || null;
+    let loadingPage = false;
 
     // Manejar conexión de Socket.IO
     socket.on('connect', () => {
@@ -14,22 +32,100 @@ document.addEventListener('DOMContentLoaded', () => {
         // socket.emit('join_room', { room: 'admin_dashboard' }); // Ya se hace en el backend si el usuario está autenticado.
     });
 
+    // El usuario fue eliminado por otro administrador: fin de la sesión
+    socket.on('session_revoked', () => {
+        window.location.href = '/admin/logout';
+    });
+
     socket.on('disconnect', () => {
         console.log('Desconectado del servidor de Socket.IO');
     });
 
-    // Manejar notificaciones de nuevos pedidos
-    socket.on('new_order_alert', (data) => {
-        console.log('Nuevo pedido recibido (Socket.IO):', data);
-        displayNewOrderNotification(data);
-        addNewOrderToList(data);
+    // Eventos del dashboard: llegan en directo o reenviados tras una reconexión
+    const dashboardHandlers = {
+        // Manejar notificaciones de nuevos pedidos
+        new_order_alert: (data) => {
+            console.log('Nuevo pedido recibido (Socket.IO):', data);
+            displayNewOrderNotification(data);
+            addNewOrderToList(data);
+        },
+
+        // Lote de nuevos pedidos agrupados en el servidor: una sola actualización del DOM
+        new_order_alerts: (data) => {
+            console.log(`Lote de ${data.orders.length} pedidos nuevos (Socket.IO)`);
+            if (data.orders.length === 1) {
+                displayNewOrderNotification(data.orders[0]);
+            } else {
+                displayNewOrdersSummaryNotification(data.orders);
+            }
+            addNewOrdersToList(data.orders);
+        },
+
+        // Manejar actualizaciones de estado de pedidos
+        // Llega un único evento con todas las filas cambiadas (cambio individual o en lote)
+        order_status_updated: (data) => {
+            console.log('Estado de pedido actualizado (Socket.IO):', data);
+            data.orders.forEach((order) => updateOrderStatusInList(order.order_id, order.new_status, order.version));
+            if (data.orders.length === 1) {
+                displayStatusUpdateNotification(data.orders[0]);
+            } else {
+                displayBulkStatusUpdateNotification(data.orders);
+            }
+        }
+    };
+
+    function markEventSeen(seq) {
+        seenEventSeqs.add(seq);
+        while (seenEventSeqs.has(lastEventSeq + 1)) {
+            lastEventSeq += 1;
+            seenEventSeqs.delete(lastEventSeq);
+        }
+        if (seq - lastEventSeq > EVENT_SEQ_WINDOW) {
+            lastEventSeq = seq - EVENT_SEQ_WINDOW;
+            seenEventSeqs = new Set([...seenEventSeqs].filter((seen) => seen > lastEventSeq));
+        }
+    }
+
+    function handleDashboardEvent(event, data) {
+        if (data.epoch !== eventEpoch) {
+            // El servidor empezó otra numeración
+            eventEpoch = data.epoch;
+            lastEventSeq = data.seq - 1;
+            seenEventSeqs = new Set();
+        }
+        // Los eventos ya aplicados (reenvío y directo a la vez) se descartan por su número;
+        // uno que llega tarde, con un número menor que otros ya aplicados, sí se aplica
+        if (data.seq <= lastEventSeq || seenEventSeqs.has(data.seq)) {
+            return;
+        }
+        markEventSeen(data.seq);
+        dashboardHandlers[event](data);
+    }
+
+    Object.keys(dashboardHandlers).forEach((event) => {
+        socket.on(event, (data) => handleDashboardEvent(event, data));
     });
 
-    // Manejar actualizaciones de estado de pedidos
-    socket.on('order_status_updated', (data) => {
-        console.log('Estado de pedido actualizado (Socket.IO):', data);
-        updateOrderStatusInList(data.order_id, data.new_status);
-        displayStatusUpdateNotification(data);
+    // Eventos perdidos mientras el socket estaba desconectado
+    socket.on('dashboard_replay', (data) => {
+        console.log(`Reenviando ${data.events.length} eventos perdidos (Socket.IO)`);
+        data.events.forEach((item) => handleDashboardEvent(item.event, item.data));
+    });
+
+    // El hueco es mayor que el buffer del servidor: se sincroniza la lista con el feed
+    socket.on('dashboard_resync', (data) => {
+        console.log('Resincronizando pedidos tras la reconexión (Socket.IO)');
+        eventEpoch = data.epoch;
+        lastEventSeq = data.seq;
+        seenEventSeqs = new Set();
+        refreshOrders();
+    });
+
+    // Otro administrador cambió esos pedidos antes: se muestra su estado actual
+    socket.on('status_update_conflict', (data) => {
+        console.warn('Conflicto al actualizar estado (Socket.IO):', data);
+        data.orders.forEach((order) => updateOrderStatusInList(order.order_id, order.status, order.version));
+        displayConflictNotification(data.orders);
     });
 
 
@@ -51,6 +147,23 @@ document.addEventListener('DOMContentLoaded', () => {
         }, 8000); // 8 segundos
     }
 
+    function displayNewOrdersSummaryNotification(orders) {
+        const total = orders.reduce((sum, order) => sum + order.total_amount, 0);
+        const alertDiv = document.createElement('div');
+        alertDiv.className = 'alert alert-info alert-dismissible fade show alert-new-order';
+        alertDiv.setAttribute('role', 'alert');
+        alertDiv.innerHTML = `
+            <strong>¡${orders.length} Pedidos Nuevos!</strong> Total: $${total.toFixed(2)}.
+            <button type="button" class="close" data-dismiss="alert" aria-label="Close">
+                <span aria-hidden="true">×</span>
+            </button>
+        `;
+        notificationArea.appendChild(alertDiv);
+        setTimeout(() => {
+            $(alertDiv).alert('close');
+        }, 8000);
+    }
+
     function displayStatusUpdateNotification(data) {
         const alertDiv = document.createElement('div');
         alertDiv.className = 'alert alert-success alert-dismissible fade show alert-new-order'; // Reusa la animación
@@ -67,15 +180,52 @@ document.addEventListener('DOMContentLoaded', () => {
         }, 5000);
     }
 
-    function addNewOrderToList(order) {
+    function displayBulkStatusUpdateNotification(orders) {
+        const alertDiv = document.createElement('div');
+        alertDiv.className = 'alert alert-success alert-dismissible fade show alert-new-order';
+        alertDiv.setAttribute('role', 'alert');
+        alertDiv.innerHTML = `
+            <strong>¡Estados Actualizados!</strong> ${orders.length} pedidos cambiaron de estado.
+            <button type="button" class="close" data-dismiss="alert" aria-label="Close">
+                <span aria-hidden="true">×</span>
+            </button>
+        `;
+        notificationArea.appendChild(alertDiv);
+        setTimeout(() => {
+            $(alertDiv).alert('close');
+        }, 5000);
+    }
+
+    function displayConflictNotification(orders) {
+        const ids = orders.map((order) => `#${order.order_id}`).join(', ');
+        const alertDiv = document.createElement('div');
+        alertDiv.className = 'alert alert-warning alert-dismissible fade show alert-new-order';
+        alertDiv.setAttribute('role', 'alert');
+        alertDiv.innerHTML = `
+            <strong>Conflicto:</strong> ${ids} ya había sido modificado por otro administrador. Revisa su estado actual.
+            <button type="button" class="close" data-dismiss="alert" aria-label="Close">
+                <span aria-hidden="true">×</span>
+            </button>
+        `;
+        notificationArea.appendChild(alertDiv);
+        setTimeout(() => {
+            $(alertDiv).alert('close');
+        }, 8000);
+    }
+
+    function buildOrderElement(order) {
         // Convierte el timestamp ISO a un formato legible
         const orderDate = new Date(order.order_date).toLocaleString();
 
         const newOrderItem = document.createElement('div');
         newOrderItem.classList.add('order-item');
         newOrderItem.id = `order-${order.order_id}`; // Asegura que el ID exista
+        newOrderItem.dataset.orderId = order.order_id;
+        newOrderItem.dataset.version = order.version;
+        newOrderItem.dataset.orderDate = order.order_date;
         newOrderItem.innerHTML = `
             <div>
+                <input type="checkbox" class="order-select mr-2" value="${order.order_id}">
                 <strong>Pedido #${order.order_id}</strong><br>
                 Cliente: ${order.customer_name} (${order.customer_phone || 'N/A'})<br>
                 Total: $${order.total_amount.toFixed(2)}<br>
@@ -97,12 +247,27 @@ document.addEventListener('DOMContentLoaded', () => {
                 </div>
             </div>
         `;
-        // Añadir el nuevo pedido al principio de la lista
-        if (ordersList.firstChild) {
-            ordersList.insertBefore(newOrderItem, ordersList.firstChild);
-        } else {
-            ordersList.appendChild(newOrderItem);
-        }
+        return newOrderItem;
+    }
+
+    function addNewOrderToList(order) {
+        addNewOrdersToList([order]);
+    }
+
+    function addNewOrdersToList(orders) {
+        // Se construye todo el lote fuera del DOM y se inserta de una vez, el más reciente arriba
+        const fragment = document.createDocumentFragment();
+        orders
+            .slice()
+            .sort((a, b) => new Date(b.order_date) - new Date(a.order_date) || b.order_id - a.order_id)
+            .forEach((order) => {
+                const existing = document.getElementById(`order-${order.order_id}`);
+                if (existing) {
+                    existing.remove();
+                }
+                fragment.appendChild(buildOrderElement(order));
+            });
+        ordersList.insertBefore(fragment, ordersList.firstChild);
          // Asegúrate de que el mensaje de "no pedidos" se elimine si estaba presente
         const noOrdersP = ordersList.querySelector('p.text-center');
         if (noOrdersP) {
@@ -110,9 +275,102 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    function updateOrderStatusInList(orderId, newStatus) {
+    function appendOrdersToList(orders) {
+        const fragment = document.createDocumentFragment();
+        orders.forEach((order) => {
+            if (!document.getElementById(`order-${order.order_id}`)) {
+                fragment.appendChild(buildOrderElement(order));
+            }
+        });
+        ordersList.appendChild(fragment);
+    }
+
+    function applyOrderChanges(orders) {
+        // Los pedidos ya mostrados se reemplazan en su sitio si cambió su versión; los nuevos solo se insertan
+        // si son más recientes que el primero de la lista (los antiguos llegan con el scroll)
+        const firstOrder = ordersList.querySelector('.order-item');
+        const newestShown = firstOrder ? firstOrder.dataset.orderDate : null;
+        const newOrders = [];
+        orders.forEach((order) => {
+            const existing = document.getElementById(`order-${order.order_id}`);
+            if (existing) {
+                // La sincronización repite los cambios recientes: los que ya se muestran se saltan
+                if (existing.dataset.version !== String(order.version)) {
+                    existing.replaceWith(buildOrderElement(order));
+                }
+            } else if (!newestShown || new Date(order.order_date) >= new Date(newestShown)) {
+                newOrders.push(order);
+            }
+        });
+        if (newOrders.length > 0) {
+            addNewOrdersToList(newOrders);
+        }
+    }
+
+    async function fetchFeed(params) {
+        const response = await fetch(`/admin-api/orders/feed?${new URLSearchParams(params)}`, {
+            credentials: 'same-origin',
+            headers: { 'Accept': 'application/json' }
+        });
+        if (!response.ok) {
+            throw new Error(`Feed de pedidos respondió ${response.status}`);
+        }
+        return response.json();
+    }
+
+    async function loadNextPage() {
+        if (!nextCursor || loadingPage) {
+            return;
+        }
+        loadingPage = true;
+        ordersListEnd.textContent = 'Cargando...';
+        try {
+            const data = await fetchFeed({ cursor: nextCursor });
+            appendOrdersToList(data.orders);
+            nextCursor = data.next_cursor;
+        } catch (error) {
+            console.error('Error cargando pedidos:', error);
+        } finally {
+            loadingPage = false;
+            ordersListEnd.textContent = nextCursor ? '' : 'No hay más pedidos.';
+        }
+    }
+
+    // Actualiza la lista con lo que cambió desde la última sincronización, sin recargar la página
+    window.refreshOrders = async () => {
+        try {
+            let hasMore = true;
+            while (hasMore) {
+                const data = await fetchFeed({ since: syncCursor || '' });
+                applyOrderChanges(data.orders);
+                syncCursor = data.sync_cursor;
+                hasMore = data.has_more;
+            }
+        } catch (error) {
+            console.error('Error sincronizando pedidos:', error);
+        }
+    };
+
+    // Scroll infinito: cuando el final de la lista entra en pantalla se pide la siguiente página
+    if ('IntersectionObserver' in window) {
+        new IntersectionObserver((entries) => {
+            if (entries.some((entry) => entry.isIntersecting)) {
+                loadNextPage();
+            }
+        }).observe(ordersListEnd);
+    }
+
+    function updateOrderStatusInList(orderId, newStatus, version) {
         const orderElement = document.getElementById(`order-${orderId}`);
         if (orderElement) {
+            // Un evento que llega tarde no pisa un estado más reciente
+            if (version !== undefined && orderElement.dataset.version
+                    && Number(orderElement.dataset.version) > version) {
+                return;
+            }
+            if (version !== undefined) {
+                orderElement.dataset.version = version;
+            }
             const statusSpan = orderElement.querySelector('.status-badge');
             if (statusSpan) {
                 statusSpan.className = `status-badge status-${newStatus}`;
@@ -122,8 +380,27 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // Función global para ser llamada desde los botones del dashboard
+    // Se envía la versión que el cliente conoce para detectar cambios concurrentes
+    function orderVersion(orderId) {
+        const orderElement = document.getElementById(`order-${orderId}`);
+        return orderElement && orderElement.dataset.version ? Number(orderElement.dataset.version) : null;
+    }
+
     window.updateOrderStatus = (orderId, newStatus) => {
-        socket.emit('status_update_request', { order_id: orderId, new_status: newStatus });
+        socket.emit('status_update_request', { order_id: orderId, new_status: newStatus, version: orderVersion(orderId) });
+    };
+
+    window.updateSelectedOrdersStatus = (newStatus) => {
+        const selected = Array.from(ordersList.querySelectorAll('.order-select:checked'));
+        if (selected.length === 0) {
+            return;
+        }
+        const orders = selected.map((checkbox) => {
+            const orderId = Number(checkbox.value);
+            return { order_id: orderId, version: orderVersion(orderId) };
+        });
+        socket.emit('bulk_status_update_request', { orders: orders, new_status: newStatus });
+        selected.forEach((checkbox) => { checkbox.checked = false; });
     };
 
     // Helper para capitalizar la primera letra
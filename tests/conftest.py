@@ -0,0 +1,40 @@
+# tests/conftest.py
+# Las pruebas usan SQLite en un directorio temporal (o TEST_DATABASE_URL) y la app real.
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from shared.config import Config
+
+# Antes de importar app: la configuración se copia al crear la aplicación
+_db_dir = tempfile.mkdtemp(prefix='admin_app_tests_')
+Config.SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', f'sqlite:///{_db_dir}/test.db')
+Config.ORDER_ALERT_COALESCE_SECONDS = 0
+Config.SOCKETIO_MESSAGE_QUEUE = ''
+
+
+@pytest.fixture(scope='session')
+def appmod():
+    import app as appmod
+    return appmod
+
+
+@pytest.fixture
+def app(appmod):
+    from shared.models import db
+    from shared.schema import upgrade_schema
+    with appmod.app.app_context():
+        db.drop_all()
+        upgrade_schema()
+        yield appmod.app
+        db.session.remove()
+
+
+@pytest.fixture
+def session(app):
+    from shared.models import db
+    return db.session
@@ -0,0 +1,65 @@
+# tests/test_archive.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateTable
+
+from shared.archive import archive_closed_orders
+from shared.models import db, Order, OrderItem, Product
+from shared.schema import upgrade_schema
+
+NOW = datetime(2024, 6, 1)
+
+
+def add_closed_order(session, product, name):
+    order = Order(customer_name=name, customer_address='Calle 1', customer_phone='0412-555-1234',
+                  total_amount=3.0, status='delivered', order_date=NOW - timedelta(days=60),
+                  updated_at=NOW - timedelta(days=60))
+    order.items.append(OrderItem(product_id=product.id, quantity=1, unit_price=3.0))
+    session.add(order)
+    session.commit()
+    return order
+
+
+@pytest.fixture
+def product(app, session):
+    product = Product(name='Arepa', price=3.0, description='rica')
+    session.add(product)
+    session.commit()
+    return product
+
+
+def test_archived_ids_are_not_reused(session, product):
+    for n in range(3):
+        add_closed_order(session, product, f'Cliente {n}')
+    assert archive_closed_orders(older_than_days=30, now=NOW) == 3
+
+    order = add_closed_order(session, product, 'Nuevo')
+    assert order.id == 4
+    assert order.items[0].id == 4
+    assert archive_closed_orders(older_than_days=30, now=NOW) == 1
+    assert Order.find(1, include_archived=True).customer_name == 'Cliente 0'
+    assert Order.find(4, include_archived=True).customer_name == 'Nuevo'
+
+
+def test_upgrade_adds_autoincrement_to_old_sqlite_tables(app, session, product):
+    if db.engine.dialect.name != 'sqlite':
+        pytest.skip('solo SQLite reutiliza ids sin AUTOINCREMENT')
+    for n in range(2):
+        add_closed_order(session, product, f'Cliente {n}')
+    assert archive_closed_orders(older_than_days=30, now=NOW) == 2
+    # Tablas como las creaba la versión anterior, sin AUTOINCREMENT
+    product_id = product.id
+    session.close()
+    with db.engine.begin() as conn:
+        for name in ('order_items', 'orders'):
+            ddl = str(CreateTable(db.metadata.tables[name]).compile(dialect=conn.dialect))
+            conn.execute(text(f'DROP TABLE {name}'))
+            conn.execute(text(ddl.replace(' AUTOINCREMENT', '')))
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name IN ('orders', 'order_items')"))
+
+    upgrade_schema()
+    assert 'ix_orders_order_date_id' in {index['name'] for index in inspect(db.engine).get_indexes('orders')}
+    order = add_closed_order(session, session.get(Product, product_id), 'Nuevo')
+    assert (order.id, order.items[0].id) == (3, 3)
@@ -0,0 +1,61 @@
+# tests/test_auth_cache.py
+import pytest
+
+from shared.auth_cache import AdminIdentity, TTLCache
+from shared.models import AdminUser
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(appmod):
+    # Cada prueba recrea la base de datos: los ids se repiten
+    appmod.admin_user_cache.clear()
+
+
+def admin_user_view(appmod):
+    return next(view for view in appmod.admin._views if isinstance(view, appmod.AdminUserView))
+
+
+def add_admin(session, username='ana'):
+    user = AdminUser(username=username)
+    user.set_password('secreta')
+    session.add(user)
+    session.commit()
+    return user
+
+
+def test_edited_admin_is_reloaded(app, appmod, session):
+    user = add_admin(session)
+    assert appmod.load_user(str(user.id)).username == 'ana'
+
+    user.username = 'ana.maria'
+    session.commit()
+    # Sin invalidar, sigue la copia cacheada
+    assert appmod.load_user(str(user.id)).username == 'ana'
+    admin_user_view(appmod).after_model_change(None, user, False)
+    assert appmod.load_user(str(user.id)).username == 'ana.maria'
+
+
+def test_deleted_admin_is_logged_out(app, appmod, session):
+    user = add_admin(session)
+    user_id = user.id
+    assert appmod.load_user(str(user_id)) is not None
+
+    session.delete(user)
+    session.commit()
+    admin_user_view(appmod).after_model_delete(user)
+    assert appmod.load_user(str(user_id)) is None
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    cache = TTLCache(ttl=60)
+    loads = []
+
+    def stale_loader(key):
+        # Leyó la fila antes del borrado; la invalidación llega antes de que termine
+        loads.append(key)
+        cache.invalidate(key)
+        return AdminIdentity(key, 'ana')
+
+    assert cache.get_or_load(1, stale_loader).username == 'ana'
+    assert cache.get_or_load(1, lambda key: None) is None
+    assert loads == [1]
@@ -0,0 +1,157 @@
+# tests/test_broadcast.py
+# Varios servidores Socket.IO del mismo proceso unidos por el backend en memoria,
+# como si fueran workers: cada cliente de 'admin_dashboard' recibe cada emit una sola vez.
+# Al final, la codificación de los mensajes del backend de PostgreSQL (sin servidor).
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import pytest
+import socketio
+
+from shared.broadcast import (COMPRESSED_PREFIX, NOTIFY_MAX_BYTES, MemoryManager, PostgresManager, SIGNAL_ROOM,
+                              _decode, _encode, _memory_channels)
+
+WORKERS = 4
+CLIENTS_PER_WORKER = 25
+# Latencia máxima aceptada entre el emit y la entrega al último cliente (s)
+LATENCY_BOUND = 0.5
+
+
+class Deliveries:
+    def __init__(self):
+        self.received = {}
+        self.lock = threading.Lock()
+
+    def capture(self, eio_sid, eio_pkt):
+        with self.lock:
+            self.received.setdefault(eio_sid, []).append((time.perf_counter(), eio_pkt.data))
+
+    def wait_for(self, count, timeout=2.0):
+        deadline = time.perf_counter() + timeout
+        while len(self.received) < count and time.perf_counter() < deadline:
+            time.sleep(0.001)
+
+
+@pytest.fixture
+def workers():
+    channel = f'test-{uuid.uuid4().hex}'
+    deliveries = Deliveries()
+    servers = []
+    for _ in range(WORKERS):
+        server = socketio.Server(async_mode='threading', client_manager=MemoryManager(channel=channel))
+        server._send_eio_packet = deliveries.capture
+        server.manager_initialized = True
+        server.manager.initialize()
+        servers.append(server)
+    for n in range(WORKERS * CLIENTS_PER_WORKER):
+        server = servers[n % WORKERS]
+        sid = server.manager.connect(f'client-{n}', '/')
+        server.manager.enter_room(sid, '/', 'admin_dashboard')
+    yield servers, deliveries
+    _memory_channels.pop(channel, None)
+
+
+def test_emit_reaches_every_dashboard_client_once(workers):
+    servers, deliveries = workers
+    clients = WORKERS * CLIENTS_PER_WORKER
+    started = time.perf_counter()
+    servers[0].emit('new_order_alert', {'order_id': 1}, room='admin_dashboard')
+    deliveries.wait_for(clients)
+    # Margen para detectar entregas duplicadas
+    time.sleep(0.05)
+
+    assert len(deliveries.received) == clients
+    for packets in deliveries.received.values():
+        assert len(packets) == 1
+        assert 'new_order_alert' in packets[0][1]
+    latency = max(packets[0][0] for packets in deliveries.received.values()) - started
+    assert latency < LATENCY_BOUND
+
+
+def test_server_signals_reach_every_worker_and_no_client(workers):
+    servers, deliveries = workers
+    calls = []
+    for n, server in enumerate(servers):
+        server.manager.signal_handlers['catalog_changed'] = lambda data, n=n: calls.append((n, data))
+
+    started = time.perf_counter()
+    servers[1].manager.send_signal('catalog_changed', {'version': 2})
+    deadline = started + LATENCY_BOUND
+    while len(calls) < WORKERS and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    time.sleep(0.05)
+
+    assert sorted(calls) == [(n, {'version': 2}) for n in range(WORKERS)]
+    assert deliveries.received == {}
+    assert all(not list(server.manager.get_participants('/', SIGNAL_ROOM)) for server in servers)
+
+
+class FakeEngine:
+    # Guarda los payloads de pg_notify en lugar de enviarlos
+    def __init__(self):
+        self.payloads = []
+
+    def connect(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params):
+        self.payloads.append(params['payload'])
+
+    def commit(self):
+        pass
+
+
+def emit_message(data):
+    return {'method': 'emit', 'event': 'new_order_alerts', 'data': data, 'namespace': '/',
+            'room': 'admin_dashboard', 'skip_sid': None, 'callback': None, 'host_id': 'worker-1'}
+
+
+@pytest.fixture
+def postgres_manager():
+    # create_engine no abre conexiones: no hace falta un servidor
+    manager = PostgresManager('postgresql://admin@localhost:1/admin_test', channel='test_events')
+    manager.engine.dispose()
+    manager.engine = FakeEngine()
+    return manager
+
+
+def test_small_message_is_sent_as_plain_json(postgres_manager):
+    message = emit_message({'orders': [{'order_id': 1, 'customer_name': 'Ana'}]})
+    postgres_manager._publish(message)
+
+    [payload] = postgres_manager.engine.payloads
+    assert not payload.startswith(COMPRESSED_PREFIX)
+    assert json.loads(_decode(payload)) == message
+
+
+def test_large_message_is_compressed_under_the_notify_limit(postgres_manager):
+    message = emit_message({'orders': [{'order_id': n, 'customer_name': f'Cliente {n}', 'customer_address': 'Calle 1'}
+                                       for n in range(500)]})
+    assert len(json.dumps(message)) > NOTIFY_MAX_BYTES
+    postgres_manager._publish(message)
+
+    [payload] = postgres_manager.engine.payloads
+    assert payload.startswith(COMPRESSED_PREFIX)
+    assert len(payload) <= NOTIFY_MAX_BYTES
+    assert json.loads(_decode(payload)) == message
+
+
+def test_oversized_message_is_dropped_and_logged(postgres_manager, caplog):
+    # Datos aleatorios: ni comprimidos caben en un NOTIFY
+    message = emit_message({'blob': os.urandom(NOTIFY_MAX_BYTES).hex()})
+    assert len(_encode(message)) > NOTIFY_MAX_BYTES
+    with caplog.at_level(logging.ERROR, logger='admin_app.broadcast'):
+        postgres_manager._publish(message)
+
+    assert postgres_manager.engine.payloads == []
+    assert 'demasiado grande para NOTIFY' in caplog.text
@@ -0,0 +1,74 @@
+# tests/test_export.py
+# La exportación debe usar memoria acotada sin importar cuántas filas tenga. Por defecto se
+# exportan pocas filas para que la suite sea rápida; para la prueba completa:
+#   EXPORT_TEST_ROWS=1000000 python -m pytest tests/test_export.py
+import json
+import os
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select
+
+from shared.archive import archive_closed_orders
+from shared.export import generate_export
+from shared.models import Order, OrderItem, Product
+
+EXPORT_TEST_ROWS = int(os.environ.get('EXPORT_TEST_ROWS', '10000'))
+# Pico de memoria permitido (tracemalloc) mientras se genera la exportación completa
+MEMORY_CEILING = 8 * 1024 * 1024
+SEED_CHUNK = 10000
+
+
+@pytest.fixture
+def many_orders(app, session):
+    # Un item por pedido: cada pedido es una fila de la exportación
+    product = Product(name='Arepa', price=3.0, description='rica')
+    session.add(product)
+    session.commit()
+    start = datetime(2024, 1, 1)
+    for first in range(0, EXPORT_TEST_ROWS, SEED_CHUNK):
+        count = min(SEED_CHUNK, EXPORT_TEST_ROWS - first)
+        session.execute(insert(Order), [
+            {'customer_name': f'Cliente {n}', 'customer_address': 'Calle 1', 'customer_phone': '0412-555-1234',
+             'customer_phone_digits': '04125551234', 'total_amount': 3.0, 'status': 'delivered',
+             'order_date': start + timedelta(seconds=n), 'updated_at': start, 'version': 1}
+            for n in range(first, first + count)
+        ])
+        ids = session.scalars(select(Order.id).order_by(Order.id.desc()).limit(count)).all()
+        session.execute(insert(OrderItem), [
+            {'order_id': order_id, 'product_id': product.id, 'quantity': 1, 'unit_price': 3.0} for order_id in ids
+        ])
+        session.commit()
+    return EXPORT_TEST_ROWS
+
+
+@pytest.mark.parametrize('export_format', ['csv', 'ndjson'])
+def test_export_memory_is_bounded(many_orders, export_format):
+    lines = 0
+    tracemalloc.start()
+    try:
+        for chunk in generate_export(export_format):
+            lines += chunk.count('\n')
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    header = 1 if export_format == 'csv' else 0
+    assert lines == many_orders + header
+    assert peak < MEMORY_CEILING, f'pico de {peak / 1024 / 1024:.1f} MB exportando {many_orders} filas'
+
+
+@pytest.mark.parametrize('include_archived, expected', [(True, [1, 2, 3, 4, 5]), (False, [3, 4, 5])])
+def test_export_includes_archived_orders(app, session, include_archived, expected):
+    start = datetime(2024, 1, 1)
+    for n in range(1, 6):
+        # Los dos primeros están entregados desde hace tiempo: se archivan
+        session.add(Order(customer_name=f'Cliente {n}', customer_address='Calle 1', customer_phone='0412-555-1234',
+                          total_amount=3.0, status='delivered' if n <= 2 else 'pending',
+                          order_date=start + timedelta(days=n), updated_at=start))
+    session.commit()
+    assert archive_closed_orders(older_than_days=30, now=start + timedelta(days=60)) == 2
+
+    lines = ''.join(generate_export('ndjson', include_archived=include_archived)).splitlines()
+    assert [json.loads(line)['customer_name'] for line in lines] == [f'Cliente {n}' for n in expected]
@@ -0,0 +1,19 @@
+# tests/test_metrics.py
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+
+def test_failed_statement_leaves_nothing_on_the_connection(app, session):
+    with app.test_request_context():
+        g.sql_stats = [0, 0.0]
+        with pytest.raises(SQLAlchemyError):
+            session.execute(text('SELECT * FROM tabla_que_no_existe'))
+        session.rollback()
+        connection = session.connection()
+        connection.execute(text('SELECT 1'))
+
+        assert g.sql_stats[0] == 1
+        assert 'metrics_query_start' not in connection.info
+        session.rollback()
@@ -0,0 +1,91 @@
+# tests/test_orders.py
+from datetime import datetime, timedelta
+
+from flask import get_flashed_messages
+
+from shared.models import Order
+
+
+def add_order(session, **values):
+    order = Order(customer_name=values.pop('customer_name', 'Ana'), customer_address='Calle 1',
+                  customer_phone=values.pop('customer_phone', '0412-555-1234'),
+                  total_amount=values.pop('total_amount', 10.0), **values)
+    session.add(order)
+    session.commit()
+    return order
+
+
+def order_view(appmod):
+    return next(view for view in appmod.admin._views if isinstance(view, appmod.OrderAdminView))
+
+
+def edit_form_data(order, version, **changes):
+    data = {
+        'customer_name': order.customer_name, 'customer_address': order.customer_address,
+        'customer_phone': order.customer_phone, 'total_amount': str(order.total_amount),
+        'status': order.status, 'order_date': order.order_date.strftime('%Y-%m-%d %H:%M:%S'),
+        'version': str(version),
+    }
+    data.update(changes)
+    return data
+
+
+def test_admin_edit_with_stale_version_is_rejected(app, appmod, session):
+    order = add_order(session)
+    opened_version = order.version
+    # Otro administrador guarda el pedido después de que se abrió el formulario
+    order.status = 'confirmed'
+    session.commit()
+
+    view = order_view(appmod)
+    with app.test_request_context(method='POST', data=edit_form_data(order, opened_version, customer_name='Otra')):
+        form = view.edit_form(obj=order)
+        assert view.update_model(form, order) is False
+        assert any('Otro administrador' in message for message in get_flashed_messages())
+    session.expire_all()
+    assert session.get(Order, order.id).customer_name == 'Ana'
+
+
+def test_admin_edit_with_current_version_is_saved(app, appmod, session):
+    order = add_order(session)
+    view = order_view(appmod)
+    with app.test_request_context(method='POST', data=edit_form_data(order, order.version, customer_name='Otra')):
+        form = view.edit_form(obj=order)
+        assert view.update_model(form, order) is True
+    session.expire_all()
+    saved = session.get(Order, order.id)
+    assert saved.customer_name == 'Otra'
+    assert saved.version == 2
+
+
+def sync_all(since, limit):
+    from shared.orders import order_changes
+    seen = []
+    has_more = True
+    while has_more:
+        orders, since, has_more = order_changes(since, limit=limit)
+        seen += [order.id for order in orders]
+    return seen, since
+
+
+def test_sync_returns_orders_committed_late_with_an_earlier_timestamp(session):
+    from shared.orders import current_sync_cursor
+    add_order(session)
+    cursor = current_sync_cursor()
+    # Transacción lenta: updated_at se tomó antes de la última sincronización del cliente
+    late = add_order(session, customer_name='Tarde')
+    session.execute(Order.__table__.update().where(Order.id == late.id)
+                    .values(updated_at=datetime.utcnow() - timedelta(seconds=2)))
+    session.commit()
+
+    seen, _ = sync_all(cursor, limit=100)
+    assert late.id in seen
+
+
+def test_sync_pagination_finishes_when_the_overlap_window_is_larger_than_a_page(session):
+    ids = [add_order(session).id for _ in range(7)]
+    seen, cursor = sync_all(None, limit=3)
+    assert sorted(set(seen)) == ids
+    # La siguiente sincronización repite la ventana reciente y también termina
+    seen, _ = sync_all(cursor, limit=3)
+    assert sorted(set(seen)) == ids
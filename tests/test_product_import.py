@@ -0,0 +1,28 @@
+# tests/test_product_import.py
+import io
+
+import pytest
+
+from shared.models import Product
+from shared.product_import import import_products
+
+
+def run_import(text, batch_size=500):
+    return import_products(io.StringIO(text), 'csv', batch_size=batch_size).to_dict()
+
+
+@pytest.mark.parametrize('batch_size', [1, 500])
+def test_repeated_new_name_updates_the_product_created_by_the_file(app, session, batch_size):
+    report = run_import('name,price,description\nArepa,3,rica\nArepa,4,otra\n', batch_size)
+
+    assert report == {'created': 1, 'updated': 1, 'failed': 0, 'errors': []}
+    products = session.query(Product).all()
+    assert [(product.name, product.price, product.description) for product in products] == [('Arepa', 4.0, 'otra')]
+
+
+def test_partial_row_updates_a_product_created_earlier_in_the_file(app, session):
+    report = run_import('name,price,description\nArepa,3,rica\nCachapa,5,dulce\nArepa,4,\n')
+
+    assert report == {'created': 2, 'updated': 1, 'failed': 0, 'errors': []}
+    arepa = session.query(Product).filter_by(name='Arepa').one()
+    assert (arepa.price, arepa.description) == (4.0, 'rica')
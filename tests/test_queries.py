@@ -0,0 +1,67 @@
+# tests/test_queries.py
+# El número de consultas al serializar pedidos no debe depender de cuántos pedidos o items haya.
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from shared.models import db, Order, OrderItem, Product
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def add_orders(session, orders, items_per_order):
+    products = [Product(name=f'Producto {n}', price=1.0 + n, description='d') for n in range(items_per_order)]
+    session.add_all(products)
+    session.flush()
+    ids = []
+    for n in range(orders):
+        order = Order(customer_name=f'Cliente {n}', customer_address='Calle 1', customer_phone='0412',
+                      total_amount=10.0)
+        order.items = [OrderItem(product_id=product.id, quantity=2, unit_price=product.price)
+                       for product in products]
+        session.add(order)
+        session.flush()
+        ids.append(order.id)
+    session.commit()
+    session.expunge_all()
+    return ids
+
+
+def serialize(ids):
+    orders = Order.query.options(Order.items_loader()).filter(Order.id.in_(ids)).all()
+    return [order.to_dict() for order in orders]
+
+
+@pytest.mark.parametrize('orders,items_per_order', [(1, 1), (1, 5), (20, 1), (20, 5)])
+def test_serializing_orders_uses_constant_queries(session, orders, items_per_order):
+    ids = add_orders(session, orders, items_per_order)
+    with count_queries() as statements:
+        data = serialize(ids)
+    assert len(data) == orders
+    assert all(len(order['items']) == items_per_order and order['items'][0]['product_name'] for order in data)
+    # Pedidos + items (IN) con el nombre del producto en JOIN
+    assert len(statements) == 2
+
+
+@pytest.mark.parametrize('items_per_order', [1, 10])
+def test_admin_get_one_uses_constant_queries(appmod, session, items_per_order):
+    order_id = add_orders(session, 1, items_per_order)[0]
+    view = next(view for view in appmod.admin._views if isinstance(view, appmod.OrderAdminView))
+    with count_queries() as statements:
+        order = view.get_one(str(order_id))
+        names = [item.product.name for item in order.items]
+    assert len(names) == items_per_order
+    assert len(statements) == 2
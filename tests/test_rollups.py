@@ -0,0 +1,65 @@
+# tests/test_rollups.py
+from datetime import datetime
+
+from shared.models import Order, OrderItem, Product, OrderDailyRollup, ProductDailyRollup
+from shared.rollups import record_order_changes
+from tests.test_orders import add_order, edit_form_data, order_view
+
+
+def rollups(session):
+    orders = {(row.day, row.status): (row.order_count, row.revenue)
+              for row in session.query(OrderDailyRollup) if row.order_count}
+    products = {(row.day, row.product_id, row.status): (row.quantity, row.revenue)
+                for row in session.query(ProductDailyRollup) if row.quantity}
+    return orders, products
+
+
+def add_counted_order(session):
+    product = Product(name='Arepa', price=3.0, description='rica')
+    session.add(product)
+    session.flush()
+    order = add_order(session, total_amount=6.0, order_date=datetime(2024, 5, 1, 12))
+    session.add(OrderItem(order_id=order.id, product_id=product.id, quantity=2, unit_price=3.0))
+    session.commit()
+    record_order_changes([order.id])
+    session.commit()
+    return order, product
+
+
+def test_admin_edit_of_amount_and_date_moves_rollups(app, appmod, session):
+    order, product = add_counted_order(session)
+    view = order_view(appmod)
+    changes = {'total_amount': '9.0', 'order_date': '2024-05-02 12:00:00'}
+    with app.test_request_context(method='POST', data=edit_form_data(order, order.version, **changes)):
+        form = view.edit_form(obj=order)
+        assert view.update_model(form, order) is True
+
+    session.expire_all()
+    day = datetime(2024, 5, 2).date()
+    assert rollups(session) == ({(day, 'pending'): (1, 9.0)}, {(day, product.id, 'pending'): (2, 6.0)})
+
+
+def test_admin_delete_removes_order_from_rollups(app, appmod, session):
+    order, _ = add_counted_order(session)
+    view = order_view(appmod)
+    with app.test_request_context(method='POST'):
+        assert view.delete_model(order) is True
+
+    session.expire_all()
+    assert session.get(Order, order.id) is None
+    assert rollups(session) == ({}, {})
+
+
+def test_admin_edit_updates_rollups_in_the_form_transaction(app, appmod, session, monkeypatch):
+    order, product = add_counted_order(session)
+    view = order_view(appmod)
+    # Nada de rollups después del commit del formulario
+    monkeypatch.setattr(view, 'after_model_change', lambda *args: None)
+    with app.test_request_context(method='POST', data=edit_form_data(order, order.version, total_amount='9.0')):
+        form = view.edit_form(obj=order)
+        assert view.update_model(form, order) is True
+
+    session.expire_all()
+    day = datetime(2024, 5, 1).date()
+    assert rollups(session) == ({(day, 'pending'): (1, 9.0)}, {(day, product.id, 'pending'): (2, 6.0)})
+    assert session.get(Order, order.id).rollup_status == 'pending'
@@ -0,0 +1,24 @@
+# tests/test_search.py
+import pytest
+from sqlalchemy import insert, select
+
+from shared.models import Order
+from shared.search import apply_order_search
+
+
+def test_orm_orders_match_phone_search_in_any_format(session):
+    session.add(Order(customer_name='Ana', customer_address='Calle 1', customer_phone='+58 (412) 555-1234',
+                      total_amount=1.0))
+    session.commit()
+    assert apply_order_search(Order.query, '0412 555').count() == 0
+    assert apply_order_search(Order.query, '412-555').count() == 1
+
+
+def test_core_inserts_get_phone_digits_on_postgresql(session):
+    if session.get_bind().dialect.name != 'postgresql':
+        pytest.skip('El trigger de customer_phone_digits solo existe en PostgreSQL')
+    session.execute(insert(Order), [{'customer_name': 'Luis', 'customer_address': 'Calle 2',
+                                     'customer_phone': '(0414) 777-88.99', 'total_amount': 1.0}])
+    session.commit()
+    assert session.scalar(select(Order.customer_phone_digits).where(Order.customer_name == 'Luis')) == '04147778899'
+    assert apply_order_search(Order.query, '777-88').count() == 1